@@ -1,21 +1,51 @@
 """Configuration for Sonos dial controller."""
 
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Only load python-dotenv when there's a .env to read (next to the code on the Pi,
+# or in the working directory / repo root during local development)
+_here = os.path.dirname(os.path.abspath(__file__))
+_dotenv_path = next(
+    (
+        path
+        for path in (os.path.join(_here, ".env"), os.path.join(os.path.dirname(_here), ".env"), ".env")
+        if os.path.isfile(path)
+    ),
+    None,
+)
+if _dotenv_path:
+    from dotenv import load_dotenv
+    load_dotenv(_dotenv_path)
 
 # Volume adjustment per dial tick (percentage points)
 VOLUME_STEP = 2
 
-# How often to re-scan for active speaker (seconds)
+# Discovery retry interval while no speakers are found; doubles up to DISCOVERY_MAX_BACKOFF (seconds)
 ACTIVE_SPEAKER_POLL_INTERVAL = 5.0
 
+# Without event subscriptions, re-scan for the active speaker quickly while the dial is in use
+# (within DIAL_ACTIVITY_WINDOW of the last dial event) and slowly when idle (seconds)
+ACTIVE_SPEAKER_FAST_POLL_INTERVAL = 1.0
+ACTIVE_SPEAKER_IDLE_POLL_INTERVAL = 30.0
+DIAL_ACTIVITY_WINDOW = 30.0
+
+# How long a discovered speaker list is reused before running SSDP discovery again (seconds)
+SPEAKER_CACHE_TTL = 300.0
+
+# Upper bound for the discovery retry backoff while no speakers are found (seconds)
+DISCOVERY_MAX_BACKOFF = 60.0
+
+# Re-scan interval while transport events are being pushed by the speakers (seconds)
+EVENT_RESYNC_INTERVAL = 300.0
+
 # Device name pattern to look for (the Peakzooc dial)
 DIAL_DEVICE_NAME_PATTERN = "Keyboard"
 
 # Hue configuration
-HUE_BRIDGE_IP = os.getenv("HUE_BRIDGE_IP")  # Fallback IP if discovery fails
+HUE_BRIDGE_IP = os.getenv("HUE_BRIDGE_IP")  # Used first when reachable; also the fallback if discovery fails
 HUE_CONFIG_FILE = os.path.expanduser("~/.sonos-dial-hue")
-HUE_ZONES = os.getenv("HUE_ZONES", "").split(",") if os.getenv("HUE_ZONES") else []
+HUE_BRIDGE_CACHE_FILE = os.path.expanduser("~/.sonos-dial-hue-bridge")  # Last discovered bridge IP
+_hue_zones_env = os.getenv("HUE_ZONES", "")
+HUE_ZONES = tuple(zone.strip() for zone in _hue_zones_env.split(",") if zone.strip())
+HUE_ZONES_LOWER = frozenset(zone.lower() for zone in HUE_ZONES)  # For case-insensitive membership checks
 HUE_BRIGHTNESS_STEP = 25  # Brightness adjustment per dial tick (0-254 scale, ~10% per tick)
@@ -1,43 +1,170 @@
 """Read input events from the Peakzooc dial via evdev."""
 
+from __future__ import annotations
+
 import asyncio
+import fcntl
+import importlib.util
 import logging
-import time
-from typing import Callable, Optional
+import os
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from evdev import InputDevice
 
-try:
-    import evdev
-    from evdev import InputDevice, categorize, ecodes
-    EVDEV_AVAILABLE = True
-except ImportError:
-    EVDEV_AVAILABLE = False
+# Located without importing: evdev and pyudev load on first connect, so --mock never pays for them
+EVDEV_AVAILABLE = importlib.util.find_spec("evdev") is not None
+PYUDEV_AVAILABLE = importlib.util.find_spec("pyudev") is not None
+_evdev = None
 
 from config import DIAL_DEVICE_NAME_PATTERN
 
 logger = logging.getLogger(__name__)
 
+# Linux input event codes (linux/input-event-codes.h); fixed by the kernel ABI, so no evdev import is needed
+EV_KEY = 1
+KEY_MUTE = 113
+KEY_VOLUMEDOWN = 114
+KEY_VOLUMEUP = 115
+
 # Multi-click detection settings
 CLICK_DEBOUNCE = 0.30  # max time between clicks in a sequence (slightly generous to catch fast clickers)
 MAX_CLICKS = 4  # maximum clicks to detect (4 = mode switch)
 
+# Kernel struct input_event: timeval (two native longs), type (u16), code (u16), value (s32)
+_INPUT_EVENT = struct.Struct("llHHi")
+_READ_SIZE = _INPUT_EVENT.size * 64  # Up to 64 queued events per read
+
+# How often to retry connecting after a disconnect when udev hotplug events aren't available
+DIAL_RECONNECT_INTERVAL = 2.0
+
+# File to persist the dial's device path across restarts
+DIAL_DEVICE_FILE = Path.home() / ".sonos-dial-device"
+
+# Case-folded once at import so device matching doesn't re-fold the pattern per device
+_DIAL_PATTERN_FOLDED = DIAL_DEVICE_NAME_PATTERN.casefold()
+
+# Last known dial device path (lets reconnects skip the full device scan)
+_dial_path_cache: Optional[str] = None
+
+
+def _load_dial_path() -> Optional[str]:
+    """Load persisted dial device path from disk."""
+    try:
+        return DIAL_DEVICE_FILE.read_text().strip() or None
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Could not load dial device path: %s", e)
+    return None
+
+
+def _save_dial_path(path: str):
+    """Remember the dial device path in memory and on disk."""
+    global _dial_path_cache
+    _dial_path_cache = path
+    try:
+        with open(DIAL_DEVICE_FILE, 'w') as f:
+            f.write(path)
+    except Exception as e:
+        logger.debug("Could not save dial device path: %s", e)
+
+
+def invalidate_dial_device_cache():
+    """Forget the cached dial path so the next lookup does a full scan."""
+    global _dial_path_cache
+    _dial_path_cache = None
+    try:
+        os.remove(DIAL_DEVICE_FILE)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Could not remove dial device cache: %s", e)
+
+
+def _import_evdev():
+    """Import evdev once, on first use."""
+    global _evdev
+    if _evdev is None:
+        import evdev
+        _evdev = evdev
+    return _evdev
+
+
+def _matches_dial_name(name: str) -> bool:
+    """Check a device name against the dial name pattern (case-insensitive)."""
+    return _DIAL_PATTERN_FOLDED in name.casefold()
+
+
+def _sysfs_device_name(path: str) -> Optional[str]:
+    """
+    Read an input device's name from sysfs without opening the device node.
+    Returns None if sysfs isn't available for this device.
+    """
+    sysfs_path = f"/sys/class/input/{os.path.basename(path)}/device/name"
+    try:
+        with open(sysfs_path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _is_dial_device(path: str) -> bool:
+    """
+    Check whether the device at path matches the dial name pattern.
+    Uses the sysfs name when available; only opens the device node as a fallback,
+    since open/close on unrelated input devices is slow.
+    """
+    name = _sysfs_device_name(path)
+    if name is not None:
+        if _matches_dial_name(name):
+            logger.info(f"Found dial device: {name} at {path}")
+            return True
+        return False
+
+    device = _import_evdev().InputDevice(path)
+    try:
+        if _matches_dial_name(device.name):
+            logger.info(f"Found dial device: {device.name} at {path}")
+            return True
+        return False
+    finally:
+        device.close()
+
 
 def find_dial_device() -> Optional[str]:
     """
     Find the dial input device by name pattern.
+    Tries the cached path first and only scans all devices on a miss.
     Returns the device path (e.g., /dev/input/event0) or None if not found.
     """
+    global _dial_path_cache
+
     if not EVDEV_AVAILABLE:
         logger.warning("evdev not available - dial input disabled")
         return None
 
-    for path in evdev.list_devices():
+    # Fast path: verify the last known path still points at the dial
+    cached = _dial_path_cache or _load_dial_path()
+    if cached and os.path.exists(cached):
         try:
-            device = InputDevice(path)
-            if DIAL_DEVICE_NAME_PATTERN.lower() in device.name.lower():
-                logger.info(f"Found dial device: {device.name} at {path}")
+            if _is_dial_device(cached):
+                _dial_path_cache = cached
+                return cached
+        except Exception as e:
+            logger.debug("Cached dial path %s unusable: %s", cached, e)
+
+    for path in _import_evdev().list_devices():
+        if path == cached:
+            continue
+        try:
+            if _is_dial_device(path):
+                _save_dial_path(path)
                 return path
         except Exception as e:
-            logger.debug(f"Error checking device {path}: {e}")
+            logger.debug("Error checking device %s: %s", path, e)
             continue
 
     logger.warning(f"No device matching '{DIAL_DEVICE_NAME_PATTERN}' found")
@@ -61,24 +188,41 @@ class DialInputHandler:
 
     def __init__(
         self,
-        on_volume_up: Callable[[], None],
-        on_volume_down: Callable[[], None],
+        on_volume_delta: Callable[[int], None],
         on_press: Callable[[], None],
         on_double_press: Optional[Callable[[], None]] = None,
         on_triple_press: Optional[Callable[[], None]] = None,
         on_wiggle: Optional[Callable[[], None]] = None,
     ):
-        self.on_volume_up = on_volume_up
-        self.on_volume_down = on_volume_down
+        self.on_volume_delta = on_volume_delta  # Rotation: signed tick count, batched per wakeup
         self.on_press = on_press
         self.on_double_press = on_double_press
         self.on_triple_press = on_triple_press
         self.on_quadruple_press = on_wiggle  # Quadruple click for mode switch
+        # Click count -> callback (index 0 unused); missing handlers fall back to single press
+        self._click_dispatch = (
+            None,
+            on_press,
+            on_double_press or on_press,
+            on_triple_press or on_press,
+            on_wiggle or on_press,
+        )
+        # Key code -> handler, so the per-event dispatch is a single dict lookup
+        self._key_handlers = {
+            KEY_VOLUMEUP: self._on_rotate_up,
+            KEY_VOLUMEDOWN: self._on_rotate_down,
+            KEY_MUTE: self._on_click_key,
+        }
         self._device: Optional[InputDevice] = None
         self._running = False
         self._click_count = 0
         self._last_click_time = 0.0
-        self._click_task: Optional[asyncio.Task] = None
+        self._click_timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending_delta = 0  # Rotation ticks accumulated during the current wakeup
+        self._read_done: Optional[asyncio.Future] = None
+        self._udev_monitor = None
+        self._dial_added = asyncio.Event()
 
     def connect(self) -> bool:
         """
@@ -93,7 +237,10 @@ class DialInputHandler:
             return False
 
         try:
-            self._device = InputDevice(device_path)
+            self._device = _import_evdev().InputDevice(device_path)
+            # Make sure reads never block so the drain loop ends cleanly on EAGAIN
+            flags = fcntl.fcntl(self._device.fd, fcntl.F_GETFL)
+            fcntl.fcntl(self._device.fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
             logger.info(f"Connected to dial: {self._device.name}")
             return True
         except Exception as e:
@@ -103,7 +250,7 @@ class DialInputHandler:
     async def run(self):
         """
         Start the async event loop for reading dial input.
-        Runs until stopped or device disconnects.
+        Runs until stopped, reconnecting whenever the dial comes back after a disconnect.
         """
         if self._device is None:
             if not self.connect():
@@ -111,94 +258,209 @@ class DialInputHandler:
                 return
 
         self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._start_hotplug_monitor()
         logger.info("Starting dial input loop")
 
         try:
-            async for event in self._device.async_read_loop():
-                if not self._running:
+            while self._running:
+                if not await self._read_events():
                     break
+                logger.warning("Dial disconnected - waiting for it to reconnect")
+                await self._wait_for_reconnect()
+        finally:
+            self._stop_hotplug_monitor()
+            self._running = False
+            logger.info("Dial input loop stopped")
 
-                # Only handle key press events (value=1), not release or hold
-                if event.type == ecodes.EV_KEY and event.value == 1:
-                    self._handle_key(event.code)
+    async def _read_events(self) -> bool:
+        """
+        Read events until the device stops.
+        Returns True if the device disconnected (worth reconnecting), False otherwise.
+        """
+        loop = asyncio.get_running_loop()
+        fd = self._device.fd
+        self._read_done = loop.create_future()
+        loop.add_reader(fd, self._drain_events)
+        try:
+            return await self._read_done
+        finally:
+            loop.remove_reader(fd)
 
+    def _drain_events(self):
+        """Handle every queued event on each wakeup, not one per loop iteration."""
+        try:
+            fd = self._device.fd
+            while True:
+                # Unpack raw events straight from the fd rather than allocating an InputEvent per event
+                # (and don't use evdev's categorize(), which wraps every event in a KeyEvent)
+                data = os.read(fd, _READ_SIZE)
+                for _, _, event_type, code, value in _INPUT_EVENT.iter_unpack(data):
+                    # Only handle key press events (value=1), not release or hold
+                    if event_type == EV_KEY and value == 1:
+                        self._handle_key(code)
+                if len(data) < _READ_SIZE:
+                    break  # Short read: nothing left queued
+        except BlockingIOError:
+            pass  # Kernel queue drained
+        except OSError as e:
+            # Device went away (unplugged/re-enumerated) - don't trust the cached path
+            logger.error(f"Dial device error: {e}")
+            invalidate_dial_device_cache()
+            self._close_device()
+            self._finish_read(self._running)
         except Exception as e:
             logger.error(f"Error in dial input loop: {e}")
-        finally:
-            self._running = False
-            logger.info("Dial input loop stopped")
+            self._finish_read(False)
+        self._flush_volume()
+
+    def _finish_read(self, disconnected: bool):
+        """Resolve the pending read so run() can reconnect or exit."""
+        if self._read_done is not None and not self._read_done.done():
+            self._read_done.set_result(disconnected)
+
+    async def _wait_for_reconnect(self):
+        """Wait for the dial to reappear (udev hotplug event, or periodic retry as a fallback)."""
+        while self._running:
+            if self._udev_monitor is not None:
+                self._dial_added.clear()
+                if self.connect():
+                    return
+                await self._dial_added.wait()
+            else:
+                await asyncio.sleep(DIAL_RECONNECT_INTERVAL)
+            if self._running and self.connect():
+                return
+
+    def _start_hotplug_monitor(self):
+        """Subscribe to udev input events so reconnects don't need a rescan loop."""
+        if not PYUDEV_AVAILABLE or self._udev_monitor is not None:
+            return
+
+        try:
+            import pyudev
+            context = pyudev.Context()
+            monitor = pyudev.Monitor.from_netlink(context)
+            monitor.filter_by("input")
+            monitor.start()
+            asyncio.get_running_loop().add_reader(monitor.fileno(), self._on_udev)
+            self._udev_monitor = monitor
+            logger.debug("Watching udev for dial hotplug events")
+        except Exception as e:
+            logger.debug("udev hotplug monitor unavailable: %s", e)
+
+    def _stop_hotplug_monitor(self):
+        """Unregister the udev monitor from the event loop."""
+        if self._udev_monitor is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._udev_monitor.fileno())
+        except Exception:
+            pass
+        self._udev_monitor = None
+
+    def _on_udev(self):
+        """Drain pending udev events; wake the reconnect wait when a matching dial appears."""
+        while True:
+            device = self._udev_monitor.poll(0)
+            if device is None:
+                break
+            node = device.device_node
+            if device.action != "add" or not node or not node.startswith("/dev/input/event"):
+                continue
+            name = _sysfs_device_name(node)
+            if name is not None and _matches_dial_name(name):
+                logger.info(f"Dial device added: {name} at {node}")
+                self._dial_added.set()
+
+    def _close_device(self):
+        """Close and forget the current device."""
+        if self._device:
+            try:
+                self._device.close()
+            except Exception:
+                pass
+        self._device = None
 
     def _handle_key(self, code: int):
-        """Handle a key press event."""
-        if code == ecodes.KEY_VOLUMEUP:
-            logger.debug("Dial: volume up")
-            self.on_volume_up()
-        elif code == ecodes.KEY_VOLUMEDOWN:
-            logger.debug("Dial: volume down")
-            self.on_volume_down()
-        elif code == ecodes.KEY_MUTE:
-            self._handle_click()
+        """Handle a key press event. Rotation ticks are accumulated and flushed once per wakeup."""
+        handler = self._key_handlers.get(code)
+        if handler is not None:
+            handler()
         else:
-            logger.debug(f"Dial: unknown key code {code}")
+            logger.debug("Dial: unknown key code %s", code)
+
+    def _on_rotate_up(self):
+        """Clockwise tick."""
+        logger.debug("Dial: volume up")
+        self._pending_delta += 1
+
+    def _on_rotate_down(self):
+        """Counter-clockwise tick."""
+        logger.debug("Dial: volume down")
+        self._pending_delta -= 1
+
+    def _on_click_key(self):
+        """Dial press."""
+        self._flush_volume()  # Keep rotation and clicks in order
+        self._handle_click()
+
+    def _flush_volume(self):
+        """Deliver accumulated rotation ticks as one batched callback."""
+        delta = self._pending_delta
+        if delta == 0:
+            return
+        self._pending_delta = 0
+        self.on_volume_delta(delta)
 
     def _handle_click(self):
         """Handle a click with multi-click detection using debounce."""
-        now = time.time()
+        now = self._loop.time()  # Monotonic, and already cached by the loop
         time_since_last = now - self._last_click_time
+        debug = logger.isEnabledFor(logging.DEBUG)
 
         # If within debounce window of last click, it's part of the same sequence
         if time_since_last < CLICK_DEBOUNCE:
             self._click_count += 1
-            logger.debug(f"Click {self._click_count} (gap: {time_since_last:.3f}s)")
+            if debug:
+                logger.debug("Click %s (gap: %.3fs)", self._click_count, time_since_last)
         else:
             self._click_count = 1
-            logger.debug(f"Click 1 (new sequence, gap: {time_since_last:.3f}s)")
+            if debug:
+                logger.debug("Click 1 (new sequence, gap: %.3fs)", time_since_last)
 
         self._last_click_time = now
 
         # Cancel any pending click resolution
-        if self._click_task and not self._click_task.done():
-            self._click_task.cancel()
-            logger.debug("Cancelled pending resolution")
+        if self._click_timer is not None:
+            self._click_timer.cancel()
+            self._click_timer = None
+            if debug:
+                logger.debug("Cancelled pending resolution")
 
         # If we've reached max clicks, resolve immediately (no waiting)
         if self._click_count >= MAX_CLICKS:
-            logger.debug(f"Max clicks reached ({self._click_count}), resolving immediately")
+            if debug:
+                logger.debug("Max clicks reached (%s), resolving immediately", self._click_count)
             self._resolve_clicks()
         else:
             # Wait for debounce period to see if more clicks come
-            self._click_task = asyncio.create_task(self._delayed_resolve())
-
-    async def _delayed_resolve(self):
-        """Wait for debounce period, then resolve."""
-        await asyncio.sleep(CLICK_DEBOUNCE)
-        self._resolve_clicks()
+            self._click_timer = self._loop.call_later(CLICK_DEBOUNCE, self._resolve_clicks)
 
     def _resolve_clicks(self):
-        """Execute the appropriate callback based on click count."""
+        """Execute the callback for the resolved click count."""
+        self._click_timer = None
         count = self._click_count
         self._click_count = 0
 
-        if count == 1:
-            logger.debug("Dial: single click -> play/pause")
-            self.on_press()
-        elif count == 2 and self.on_double_press:
-            logger.debug("Dial: double click -> next")
-            self.on_double_press()
-        elif count == 3 and self.on_triple_press:
-            logger.debug("Dial: triple click -> previous")
-            self.on_triple_press()
-        elif count >= 4 and self.on_quadruple_press:
-            logger.debug("Dial: quadruple click -> mode switch")
-            self.on_quadruple_press()
-        else:
-            # Fallback to single press if no handler
-            logger.debug(f"Dial: {count} clicks, falling back to single press")
-            self.on_press()
+        logger.debug("Dial: %s click(s)", count)
+        self._click_dispatch[min(count, MAX_CLICKS)]()
 
     def stop(self):
         """Stop the event loop by closing the device."""
         self._running = False
+        self._finish_read(False)
+        self._dial_added.set()  # Wake any pending reconnect wait
         if self._device:
             try:
                 self._device.close()
@@ -215,23 +477,30 @@ class MockDialInputHandler:
 
     def __init__(
         self,
-        on_volume_up: Callable[[], None],
-        on_volume_down: Callable[[], None],
+        on_volume_delta: Callable[[int], None],
         on_press: Callable[[], None],
         on_double_press: Optional[Callable[[], None]] = None,
         on_triple_press: Optional[Callable[[], None]] = None,
         on_wiggle: Optional[Callable[[], None]] = None,
     ):
-        self.on_volume_up = on_volume_up
-        self.on_volume_down = on_volume_down
+        self.on_volume_delta = on_volume_delta  # Rotation: signed tick count, batched per wakeup
         self.on_press = on_press
         self.on_double_press = on_double_press
         self.on_triple_press = on_triple_press
         self.on_quadruple_press = on_wiggle  # Quadruple click for mode switch
+        # Click count -> callback (index 0 unused); missing handlers fall back to single press
+        self._click_dispatch = (
+            None,
+            on_press,
+            on_double_press or on_press,
+            on_triple_press or on_press,
+            on_wiggle or on_press,
+        )
         self._running = False
         self._click_count = 0
         self._last_click_time = 0.0
-        self._click_task: Optional[asyncio.Task] = None
+        self._click_timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
 
     def connect(self) -> bool:
         """Always returns True for mock."""
@@ -242,7 +511,7 @@ class MockDialInputHandler:
         self._running = True
         logger.info("Starting MOCK dial input (use +/-/p, or 2/3/4 for double/triple/quadruple click)")
 
-        loop = asyncio.get_event_loop()
+        loop = self._loop = asyncio.get_running_loop()
         reader = asyncio.StreamReader()
         protocol = asyncio.StreamReaderProtocol(reader)
 
@@ -257,10 +526,10 @@ class MockDialInputHandler:
                 char = line.decode().strip()
                 if char == '+':
                     logger.debug("Mock: volume up")
-                    self.on_volume_up()
+                    self.on_volume_delta(1)
                 elif char == '-':
                     logger.debug("Mock: volume down")
-                    self.on_volume_down()
+                    self.on_volume_delta(-1)
                 elif char == 'p':
                     self._handle_click()
                 elif char == '2':
@@ -283,7 +552,7 @@ class MockDialInputHandler:
 
     def _handle_click(self):
         """Handle a click with multi-click detection using debounce."""
-        now = time.time()
+        now = self._loop.time()
 
         if now - self._last_click_time < CLICK_DEBOUNCE:
             self._click_count += 1
@@ -292,39 +561,23 @@ class MockDialInputHandler:
 
         self._last_click_time = now
 
-        if self._click_task and not self._click_task.done():
-            self._click_task.cancel()
+        if self._click_timer is not None:
+            self._click_timer.cancel()
+            self._click_timer = None
 
         if self._click_count >= MAX_CLICKS:
             self._resolve_clicks()
         else:
-            self._click_task = asyncio.create_task(self._delayed_resolve())
-
-    async def _delayed_resolve(self):
-        """Wait for debounce period, then resolve."""
-        await asyncio.sleep(CLICK_DEBOUNCE)
-        self._resolve_clicks()
+            self._click_timer = self._loop.call_later(CLICK_DEBOUNCE, self._resolve_clicks)
 
     def _resolve_clicks(self):
-        """Execute the appropriate callback based on click count."""
+        """Execute the callback for the resolved click count."""
+        self._click_timer = None
         count = self._click_count
         self._click_count = 0
 
-        if count == 1:
-            logger.debug("Mock: single press -> play/pause")
-            self.on_press()
-        elif count == 2 and self.on_double_press:
-            logger.debug("Mock: double press -> next")
-            self.on_double_press()
-        elif count == 3 and self.on_triple_press:
-            logger.debug("Mock: triple press -> previous")
-            self.on_triple_press()
-        elif count >= 4 and self.on_quadruple_press:
-            logger.debug("Mock: quadruple press -> mode switch")
-            self.on_quadruple_press()
-        else:
-            logger.debug(f"Mock: {count} clicks, falling back to single press")
-            self.on_press()
+        logger.debug("Mock: %s click(s)", count)
+        self._click_dispatch[min(count, MAX_CLICKS)]()
 
     def stop(self):
         """Stop the event loop."""
@@ -1,49 +1,245 @@
 """Philips Hue control using the phue library."""
 
+from __future__ import annotations
+
+import http.client
+import importlib.util
 import json
 import logging
+import socket
+import threading
+import time
 import urllib.request
-from typing import Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
-try:
-    from phue import Bridge, PhueRegistrationException
-    PHUE_AVAILABLE = True
-except ImportError:
-    PHUE_AVAILABLE = False
-    Bridge = None
-    PhueRegistrationException = Exception
+if TYPE_CHECKING:
+    from phue import Bridge
 
-from config import HUE_CONFIG_FILE, HUE_BRIDGE_IP
+from config import HUE_CONFIG_FILE, HUE_BRIDGE_IP, HUE_BRIDGE_CACHE_FILE, HUE_ZONES_LOWER
 
 logger = logging.getLogger(__name__)
 
+# Timeout for bridge requests (seconds). Requests share one connection under a lock, so a stalled
+# bridge would hold up every queued dial update for this long; keep it in line with the Sonos timeout
+HUE_REQUEST_TIMEOUT = 3.0
+
+# phue is imported on first connect (found with find_spec, without importing), like SoCo in sonos_control
+PHUE_AVAILABLE = importlib.util.find_spec("phue") is not None
+_phue = None
+_KeepAliveBridge = None
+
+
+def _import_phue():
+    """Import phue once and build the keep-alive Bridge subclass on top of it."""
+    global _phue, _KeepAliveBridge
+    if _phue is None:
+        import phue
+
+        class KeepAliveBridge(phue.Bridge):
+            """
+            phue Bridge that reuses one HTTP connection to the bridge.
+            Stock phue opens a new TCP connection per request; this saves the handshake on every dial tick.
+            """
+
+            def __init__(self, *args, **kwargs):
+                self._connection: Optional[http.client.HTTPConnection] = None
+                self._connection_lock = threading.Lock()  # Requests come from several executor threads
+                super().__init__(*args, **kwargs)
+
+            def request(self, mode="GET", address=None, data=None):
+                """Send one request over the shared connection and return the decoded JSON reply."""
+                body = json.dumps(data) if mode in ("PUT", "POST") else None
+                with self._connection_lock:
+                    while True:
+                        reused = self._connection is not None
+                        if not reused:
+                            self._connection = http.client.HTTPConnection(self.ip, timeout=HUE_REQUEST_TIMEOUT)
+                        try:
+                            self._connection.request(mode, address, body)
+                            response = self._connection.getresponse().read()
+                            break
+                        except (BrokenPipeError, ConnectionResetError, http.client.RemoteDisconnected):
+                            self._connection.close()
+                            self._connection = None
+                            # The bridge dropped our idle connection before answering; retry once fresh.
+                            # Only these errors qualify: the request never got a reply, so it wasn't applied
+                            if not reused:
+                                raise
+                        except (http.client.HTTPException, OSError):
+                            # Timeouts and the like: the bridge may already have applied the request,
+                            # and retrying a relative change (bri_inc) would apply it twice
+                            self._connection.close()
+                            self._connection = None
+                            raise
+                logger.debug("%s %s %s", mode, address, data)
+                return json.loads(response.decode("utf-8"))
+
+        _KeepAliveBridge = KeepAliveBridge
+        _phue = phue
+    return _phue
+
+
+# How long a fetched group state is reused before asking the bridge again (seconds)
+GROUPS_CACHE_TTL = 2.0
+# How long state we wrote ourselves is trusted; bounds how stale changes from the Hue app can get
+LOCAL_STATE_TTL = 30.0
+
+# Lowercase zone name -> group id. Names almost never change, so this is built once per bridge
+_group_ids: dict[str, str] = {}
+
+# Group id -> (expiry time, group data), from single-group GETs or our own writes
+_group_state: dict[str, tuple[float, dict]] = {}
+
+
+def load_group_ids(bridge: Bridge) -> dict[str, str]:
+    """
+    Fetch the full groups table once and index zone names to group ids.
+    When HUE_ZONES is configured, only those zones are indexed.
+    """
+    global _group_ids
+    groups = bridge.get_group()
+    name_index = {}
+    now = time.monotonic()
+    for group_id, group_data in groups.items():
+        name = group_data.get("name", "").lower()
+        if HUE_ZONES_LOWER and name not in HUE_ZONES_LOWER:
+            continue
+        if name not in name_index:  # First match wins
+            name_index[name] = group_id
+            _group_state[group_id] = (now + GROUPS_CACHE_TTL, group_data)  # Seed state from the same fetch
+    _group_ids = name_index
+    return name_index
+
+
+def _group_id(bridge: Bridge, zone_name: str) -> Optional[str]:
+    """Look up a zone's group id by name (case-insensitive), reloading the index on a miss."""
+    key = zone_name.lower()
+    group_id = _group_ids.get(key)
+    if group_id is None:
+        group_id = load_group_ids(bridge).get(key)
+    return group_id
+
+
+def _get_group_state(bridge: Bridge, group_id: str) -> dict:
+    """
+    Get one group's state, reusing a recent fetch or the state we last wrote.
+    Uses the single-group endpoint rather than pulling the whole groups table.
+    """
+    now = time.monotonic()
+    cached = _group_state.get(group_id)
+    if cached is not None and now < cached[0]:
+        return cached[1]
+
+    group_data = bridge.get_group(int(group_id))
+    _group_state[group_id] = (now + GROUPS_CACHE_TTL, group_data)
+    return group_data
+
+
+def _remember_written_state(group_id: str, group_data: dict):
+    """Trust locally written state for LOCAL_STATE_TTL so a dial spin costs one PUT per tick, no GETs."""
+    _group_state[group_id] = (time.monotonic() + LOCAL_STATE_TTL, group_data)
+
+
+def _find_group(bridge: Bridge, zone_name: str) -> Optional[tuple[str, dict]]:
+    """Look up a zone by name (case-insensitive). Returns (group_id, group_data) or None."""
+    group_id = _group_id(bridge, zone_name)
+    if group_id is None:
+        return None
+    return group_id, _get_group_state(bridge, group_id)
+
+
+def invalidate_groups_cache():
+    """Force the next zone lookup to refetch group state from the bridge."""
+    _group_state.clear()
+
+
+def _load_cached_bridge_ip() -> Optional[str]:
+    """Load the last discovered bridge IP from disk."""
+    try:
+        return Path(HUE_BRIDGE_CACHE_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.debug("Could not load cached Hue bridge IP: %s", e)
+    return None
+
+
+def _save_cached_bridge_ip(ip: str):
+    """Persist the discovered bridge IP so the next startup can skip discovery."""
+    try:
+        with open(HUE_BRIDGE_CACHE_FILE, 'w') as f:
+            f.write(ip)
+    except Exception as e:
+        logger.debug("Could not save Hue bridge IP: %s", e)
+
+
+def forget_cached_bridge_ip(ip: str) -> bool:
+    """
+    Delete the cached bridge IP if it is ip, e.g. because something else answers there now.
+    Returns True if the cache was deleted, so the caller knows discovery is worth another try.
+    """
+    if _load_cached_bridge_ip() != ip:
+        return False
+    try:
+        Path(HUE_BRIDGE_CACHE_FILE).unlink()
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.debug("Could not delete cached Hue bridge IP: %s", e)
+        return False
+
+
+def _bridge_reachable(ip: str, timeout: float = 0.25) -> bool:
+    """Quick TCP probe of the bridge's HTTP port."""
+    try:
+        with socket.create_connection((ip, 80), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
 
 def discover_bridge() -> Optional[str]:
     """
     Discover Hue bridge on the network.
 
-    Tries Philips discovery service first (https://discovery.meethue.com),
-    falls back to configured IP if discovery fails.
+    Tries the configured IP, then the last discovered IP (either only if it answers on port 80),
+    then the Philips discovery service (https://discovery.meethue.com),
+    and falls back to the configured IP if discovery fails.
     Returns bridge IP or None if not found.
     """
     if not PHUE_AVAILABLE:
         logger.warning("phue not available - Hue control disabled")
         return None
 
-    # Try discovery service first
+    # An explicitly configured IP beats anything remembered from an earlier discovery
+    if HUE_BRIDGE_IP and _bridge_reachable(HUE_BRIDGE_IP):
+        logger.info(f"Using configured Hue bridge IP: {HUE_BRIDGE_IP}")
+        return HUE_BRIDGE_IP
+
+    # Bridge IPs rarely change, so skip the internet round trip when the cached one answers
+    cached_ip = _load_cached_bridge_ip()
+    if cached_ip and _bridge_reachable(cached_ip):
+        logger.info(f"Using cached Hue bridge IP: {cached_ip}")
+        return cached_ip
+
+    # Try discovery service
     try:
         with urllib.request.urlopen("https://discovery.meethue.com", timeout=5) as response:
             data = json.loads(response.read().decode())
             if data and len(data) > 0:
                 bridge_ip = data[0].get("internalipaddress")
                 logger.info(f"Discovered Hue bridge at {bridge_ip}")
+                if bridge_ip:
+                    _save_cached_bridge_ip(bridge_ip)
                 return bridge_ip
     except urllib.error.URLError as e:
-        logger.debug(f"Hue bridge discovery failed (network error): {e}")
+        logger.debug("Hue bridge discovery failed (network error): %s", e)
     except json.JSONDecodeError as e:
-        logger.debug(f"Hue bridge discovery failed (invalid response): {e}")
+        logger.debug("Hue bridge discovery failed (invalid response): %s", e)
     except Exception as e:
-        logger.debug(f"Hue bridge discovery failed: {e}")
+        logger.debug("Hue bridge discovery failed: %s", e)
 
     # Fall back to configured IP
     if HUE_BRIDGE_IP:
@@ -67,12 +263,17 @@ def connect_bridge(ip: str, config_path: str = HUE_CONFIG_FILE) -> Optional[Brid
     if not PHUE_AVAILABLE:
         return None
 
+    phue = _import_phue()
     try:
-        bridge = Bridge(ip, config_file_path=config_path)
+        bridge = _KeepAliveBridge(ip, config_file_path=config_path)
         bridge.connect()
         logger.info(f"Connected to Hue bridge at {ip}")
+        try:
+            load_group_ids(bridge)
+        except Exception as e:
+            logger.debug("Could not preload Hue zones: %s", e)
         return bridge
-    except PhueRegistrationException:
+    except phue.PhueRegistrationException:
         logger.warning("Hue pairing required - press the bridge button and restart")
         raise
     except Exception as e:
@@ -112,16 +313,18 @@ def toggle_zone(bridge: Bridge, zone_name: str) -> Optional[bool]:
         return None
 
     try:
-        groups = bridge.get_group()
-        for group_id, group_data in groups.items():
-            if group_data.get("name", "").lower() == zone_name.lower():
-                current_on = group_data.get("action", {}).get("on", False)
-                new_state = not current_on
-                bridge.set_group(int(group_id), "on", new_state)
-                logger.debug(f"Zone '{zone_name}' turned {'on' if new_state else 'off'}")
-                return new_state
-        logger.warning(f"Zone '{zone_name}' not found for toggle")
-        return None
+        match = _find_group(bridge, zone_name)
+        if match is None:
+            logger.warning(f"Zone '{zone_name}' not found for toggle")
+            return None
+
+        group_id, group_data = match
+        current_on = group_data.get("action", {}).get("on", False)
+        new_state = not current_on
+        bridge.set_group(int(group_id), "on", new_state)
+        invalidate_groups_cache()
+        logger.debug("Zone '%s' turned %s", zone_name, "on" if new_state else "off")
+        return new_state
     except Exception as e:
         logger.error(f"Error toggling zone: {e}")
         return None
@@ -137,37 +340,76 @@ def adjust_brightness(bridge: Bridge, zone_name: str, delta: int) -> Optional[in
         return None
 
     try:
-        groups = bridge.get_group()
-        for group_id, group_data in groups.items():
-            if group_data.get("name", "").lower() == zone_name.lower():
-                action = group_data.get("action", {})
-                current_bri = action.get("bri", 127)
-                is_on = action.get("on", False)
-
-                new_bri = max(1, min(254, current_bri + delta))
-
-                # If turning up brightness and lights are off, turn them on
-                if not is_on and delta > 0:
-                    bridge.set_group(int(group_id), {"on": True, "bri": new_bri})
-                    logger.debug(f"Zone '{zone_name}' turned on, brightness: {new_bri}")
-                # If turning down to minimum, turn off
-                elif new_bri <= 1 and delta < 0:
-                    bridge.set_group(int(group_id), "on", False)
-                    logger.debug(f"Zone '{zone_name}' turned off (brightness at minimum)")
-                    return 0
-                else:
-                    bridge.set_group(int(group_id), "bri", new_bri)
-                    logger.debug(f"Zone '{zone_name}' brightness: {current_bri} -> {new_bri}")
-
-                return new_bri
-
-        logger.warning(f"Zone '{zone_name}' not found for brightness adjustment")
-        return None
+        match = _find_group(bridge, zone_name)
+        if match is None:
+            logger.warning(f"Zone '{zone_name}' not found for brightness adjustment")
+            return None
+
+        group_id, group_data = match
+        action = group_data.setdefault("action", {})
+        current_bri = action.get("bri", 127)
+        is_on = action.get("on", False)
+
+        new_bri = max(1, min(254, current_bri + delta))
+
+        # Build every changed field into one payload so each adjustment is a single request
+        if not is_on and delta > 0:
+            # Turning up brightness while off: turn on at the new level
+            payload = {"on": True, "bri": new_bri}
+        elif new_bri <= 1 and delta < 0:
+            # Turning down to minimum: turn off
+            payload = {"on": False}
+        else:
+            payload = {"bri": new_bri}
+
+        bridge.set_group(int(group_id), payload)
+        action.update(payload)  # Keep cached state in step with what we sent
+        _remember_written_state(group_id, group_data)
+
+        if payload.get("on") is False:
+            logger.debug("Zone '%s' turned off (brightness at minimum)", zone_name)
+            return 0
+
+        logger.debug("Zone '%s' brightness: %s -> %s%s", zone_name, current_bri, new_bri, ' (turned on)' if 'on' in payload else '')
+        return new_bri
     except Exception as e:
         logger.error(f"Error adjusting brightness: {e}")
         return None
 
 
+def nudge_brightness(bridge: Bridge, zone_name: str, delta: int) -> bool:
+    """
+    Shift a zone's brightness by delta using the bridge's relative bri_inc, in a single request.
+    No state read is needed, and lights that are off stay off (used for feedback flashes).
+    Returns True on success.
+    """
+    if not bridge:
+        return False
+
+    try:
+        group_id = _group_id(bridge, zone_name)
+        if group_id is None:
+            logger.warning(f"Zone '{zone_name}' not found for brightness nudge")
+            return False
+
+        bridge.set_group(int(group_id), {"bri_inc": delta, "transitiontime": 1})
+        _group_state.pop(group_id, None)  # The bridge clamps bri_inc, so our cached level may be off
+        return True
+    except Exception as e:
+        logger.error(f"Error nudging brightness: {e}")
+        return False
+
+
+def nudge_all_zones(bridge: Bridge, zone_names, delta: int):
+    """
+    Nudge brightness of several zones by delta, one after another in the calling thread.
+    This costs one round trip per zone, but parallel requests would gain nothing: they share the bridge's
+    single keep-alive connection and were already serialized by its lock.
+    """
+    for zone_name in zone_names:
+        nudge_brightness(bridge, zone_name, delta)
+
+
 def flash_zone(bridge: Bridge, zone_name: str) -> bool:
     """
     Brief flash of lights in zone (for mode switch feedback).
@@ -178,14 +420,14 @@ def flash_zone(bridge: Bridge, zone_name: str) -> bool:
         return False
 
     try:
-        groups = bridge.get_group()
-        for group_id, group_data in groups.items():
-            if group_data.get("name", "").lower() == zone_name.lower():
-                bridge.set_group(int(group_id), "alert", "select")
-                logger.debug(f"Flashed zone '{zone_name}'")
-                return True
-        logger.warning(f"Zone '{zone_name}' not found for flash")
-        return False
+        group_id = _group_id(bridge, zone_name)
+        if group_id is None:
+            logger.warning(f"Zone '{zone_name}' not found for flash")
+            return False
+
+        bridge.set_group(int(group_id), "alert", "select")
+        logger.debug("Flashed zone '%s'", zone_name)
+        return True
     except Exception as e:
         logger.error(f"Error flashing zone: {e}")
         return False
@@ -11,23 +11,57 @@ A simple service that connects a Peakzooc dial to Sonos speakers.
 """
 
 import asyncio
+import concurrent.futures
+import importlib.util
+import json
 import logging
 import os
 import signal
 import sys
+import threading
+import time
+from pathlib import Path
 from typing import Optional
 
-from config import VOLUME_STEP, ACTIVE_SPEAKER_POLL_INTERVAL, HUE_ZONES, HUE_BRIGHTNESS_STEP
-from sonos_control import discover_speakers, get_active_speaker, adjust_volume, toggle_playback, next_track, previous_track
-from hue_control import discover_bridge, connect_bridge, toggle_zone, adjust_brightness, PHUE_AVAILABLE
+from config import (
+    VOLUME_STEP, ACTIVE_SPEAKER_POLL_INTERVAL, EVENT_RESYNC_INTERVAL, SPEAKER_CACHE_TTL, DISCOVERY_MAX_BACKOFF,
+    ACTIVE_SPEAKER_FAST_POLL_INTERVAL, ACTIVE_SPEAKER_IDLE_POLL_INTERVAL, DIAL_ACTIVITY_WINDOW,
+    HUE_ZONES, HUE_BRIGHTNESS_STEP,
+)
+from sonos_control import (
+    discover_speakers, discover_speakers_async, get_transport_state_async, coordinator_of, adjust_volume, toggle_playback, next_track, previous_track,
+    subscribe_transport_events, unsubscribe, speaker_from_ip, browse_speakers,
+)
+from throttle import AsyncThrottler, DeltaWorker
+from hue_control import discover_bridge, connect_bridge, forget_cached_bridge_ip, toggle_zone, adjust_brightness, nudge_brightness, nudge_all_zones, PHUE_AVAILABLE
+
+# File to persist state across restarts (JSON: last speaker uid/ip/name, mode, Hue zone)
+STATE_FILE = Path.home() / ".sonos-dial-state"
+# Per-setting files written by older versions, read once if STATE_FILE doesn't exist yet
+LEGACY_STATE_FILES = {
+    "speaker": Path.home() / ".sonos-dial-last-speaker",
+    "mode": Path.home() / ".sonos-dial-mode",
+    "hue_zone": Path.home() / ".sonos-dial-hue-zone",
+}
+# State changes within this window are written to disk together (seconds)
+STATE_FLUSH_DELAY = 2.0
+
+# Hue zone -> the zone a double press cycles to
+_NEXT_HUE_ZONE = {zone: HUE_ZONES[(i + 1) % len(HUE_ZONES)] for i, zone in enumerate(HUE_ZONES)}
+
+
+def write_file_atomic(path: Path, content: str):
+    """
+    Write a small state file so a crash or power cut leaves either the old or the new contents.
+    Writes to a temp file, fsyncs, then renames over the original.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
-# File to persist last speaker across restarts
-LAST_SPEAKER_FILE = os.path.expanduser("~/.sonos-dial-last-speaker")
-# File to persist mode across restarts
-MODE_FILE = os.path.expanduser("~/.sonos-dial-mode")
-# File to persist last Hue zone across restarts
-HUE_ZONE_FILE = os.path.expanduser("~/.sonos-dial-hue-zone")
-from dial_input import DialInputHandler, MockDialInputHandler, EVDEV_AVAILABLE
 
 # Configure logging (--debug flag enables DEBUG level)
 log_level = logging.DEBUG if "--debug" in sys.argv else logging.INFO
@@ -41,127 +75,268 @@ logger = logging.getLogger(__name__)
 # Dry-run mode: log actions without making API calls
 DRY_RUN = "--dry-run" in sys.argv
 
+# Minimum gap between volume/brightness calls; dial ticks in between are summed into the next call
+SONOS_VOLUME_INTERVAL = 0.03
+HUE_BRIGHTNESS_INTERVAL = 0.15  # ~7 updates/sec keeps the bridge from reordering responses
+
+# Speakers that haven't answered "are you playing?" within this are skipped for the poll
+ACTIVE_PROBE_TIMEOUT = 2.0
+
 
 class SonosDialController:
     """Main controller that ties dial input to Sonos control."""
 
+    # Slots keep the attribute reads on the dial hot path (_target_speaker, _mode) off __dict__
+    __slots__ = (
+        "speakers", "active_speaker", "dial", "_target_speaker",
+        "_last_speaker", "_last_speaker_name", "_last_speaker_uid", "_last_speaker_ip",
+        "_state", "_state_flush", "_state_lock",
+        "_by_uid", "_by_name", "_speaker_names", "_shutdown", "_poll_wake", "_last_dial_ts", "_running", "_use_mock_dial", "_loop",
+        "_speakers_cache_ts", "_discover_backoff", "_subscriptions", "_subscriptions_lock", "_zeroconf",
+        "_mode",
+        "_hue_bridge", "_hue_zone", "_hue_brightness", "_hue_brightness_worker",
+        "_sonos_exec", "_sonos_volume", "_sonos_volume_worker",
+    )
+
     def __init__(self, use_mock_dial: bool = False):
         self.speakers = []
         self.active_speaker = None
         self._last_speaker = None  # Remember last controlled speaker
+        self._target_speaker = None  # The speaker dial handlers control: active_speaker or _last_speaker
         self._last_speaker_name = None  # Persisted name for recovery
-        self._running = False
+        self._last_speaker_uid = None  # Persisted UID for recovery
+        self._last_speaker_ip = None  # Persisted IP for instant reattachment
+        self._state = {}  # Persisted settings, as written to STATE_FILE
+        self._state_flush: Optional[asyncio.TimerHandle] = None  # Pending write of STATE_FILE
+        self._state_lock = threading.Lock()  # Serializes background and shutdown writes
+        self._by_uid = {}  # Discovered speakers keyed by UID, rebuilt on each discovery
+        self._by_name = {}  # Discovered speaker name -> UID
+        # UID -> player name, filled off the event loop: SoCo's player_name can be a blocking SOAP call
+        self._speaker_names = {}
+        self._shutdown = asyncio.Event()  # Set by stop()
+        self._poll_wake = asyncio.Event()  # Cuts the poller's sleep short when the dial is used after an idle spell
+        self._last_dial_ts = float("-inf")  # Loop time of the last dial event, drives the poll interval
+        self._running = False  # True from run() entry until its cleanup finishes
         self._use_mock_dial = use_mock_dial
-        self._load_last_speaker_name()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Discovery cache: speakers are rediscovered every SPEAKER_CACHE_TTL, or with backoff while none are found
+        self._speakers_cache_ts = 0.0
+        self._discover_backoff = ACTIVE_SPEAKER_POLL_INTERVAL
+
+        # Transport event subscriptions, keyed by speaker UID (state is pushed instead of polled)
+        self._subscriptions = {}
+        self._subscriptions_lock = threading.Lock()  # Synced from both the poller and mDNS updates
+
+        # mDNS browser reporting speakers as they appear/disappear (None without zeroconf)
+        self._zeroconf = None
 
         # Mode state: "sonos" or "hue"
-        self._mode = "sonos"
-        self._load_mode()
+        self._mode = "sonos"  # Persisted value is loaded at the start of run()
 
         # Hue state
         self._hue_bridge = None
         self._hue_zone = HUE_ZONES[0]  # Default to first zone
-        self._load_hue_zone()
-        self._hue_brightness_delta = 0  # Accumulated brightness change
-        self._hue_brightness_task: Optional[asyncio.Task] = None
-        self._hue_last_send_time = 0.0  # For throttling
+        self._hue_brightness = AsyncThrottler(self._send_hue_brightness, HUE_BRIGHTNESS_INTERVAL)
+
+        # Sonos volume throttling (prevents race conditions with rapid dial turns)
+        self._sonos_volume = AsyncThrottler(self._send_sonos_volume, SONOS_VOLUME_INTERVAL)
 
-        # Sonos volume throttling state (prevents race conditions with rapid dial turns)
-        self._sonos_volume_delta = 0  # Accumulated volume change
-        self._sonos_volume_task: Optional[asyncio.Task] = None
-        self._sonos_last_send_time = 0.0  # For throttling
+        # Worker threads and the Sonos command pool; created per run() by _start_workers(),
+        # since threads and executors can't be restarted once stopped
+        self._sonos_exec = None
+        self._sonos_volume_worker = None
+        self._hue_brightness_worker = None
 
-        # Create dial handler with callbacks
+        # Create dial handler with callbacks (dial_input itself leaves evdev/pyudev unimported until connect())
+        from dial_input import DialInputHandler, MockDialInputHandler
         handler_class = MockDialInputHandler if use_mock_dial else DialInputHandler
         self.dial = handler_class(
-            on_volume_up=self._on_volume_up,
-            on_volume_down=self._on_volume_down,
+            on_volume_delta=self._on_volume_delta,
             on_press=self._on_press,
             on_double_press=self._on_double_press,
             on_triple_press=self._on_triple_press,
             on_wiggle=self._on_wiggle,
         )
 
-    def _load_last_speaker_name(self):
-        """Load persisted speaker name from disk."""
+    def _load_state(self):
+        """Load persisted state from disk (blocking, run from run() in a thread)."""
         try:
-            if os.path.exists(LAST_SPEAKER_FILE):
-                with open(LAST_SPEAKER_FILE, 'r') as f:
-                    self._last_speaker_name = f.read().strip()
-                    if self._last_speaker_name:
-                        logger.info(f"Loaded last speaker from disk: {self._last_speaker_name}")
+            self._state = json.loads(STATE_FILE.read_text())
+        except FileNotFoundError:
+            self._state = self._load_legacy_state()
         except Exception as e:
-            logger.debug(f"Could not load last speaker: {e}")
+            logger.debug("Could not load state: %s", e)
+        if not isinstance(self._state, dict):
+            self._state = {}
+        self._restore_last_speaker()
+        self._restore_mode()
+        self._restore_hue_zone()
+
+    def _load_legacy_state(self) -> dict:
+        """Read state from the per-setting files older versions wrote (superseded once STATE_FILE exists)."""
+        state = {}
+        for key, path in LEGACY_STATE_FILES.items():
+            try:
+                value = path.read_text().strip()
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.debug("Could not load %s: %s", path, e)
+                continue
+            if key == "speaker":
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    value = {"name": value}  # Oldest files stored just the name
+            state[key] = value
+        return state
+
+    def _set_state(self, key: str, value):
+        """Update a persisted setting; the state file is rewritten once per burst of changes."""
+        if self._state.get(key) == value:
+            return
+        self._state[key] = value
+        if self._state_flush is None:
+            self._state_flush = self._loop.call_later(STATE_FLUSH_DELAY, self._flush_state)
 
-    def _save_last_speaker_name(self, name: str):
-        """Persist speaker name to disk."""
-        try:
-            with open(LAST_SPEAKER_FILE, 'w') as f:
-                f.write(name)
-            self._last_speaker_name = name
-        except Exception as e:
-            logger.debug(f"Could not save last speaker: {e}")
+    def _flush_state(self):
+        """Write the state file in the background (timer callback)."""
+        self._state_flush = None
+        self._loop.run_in_executor(None, self._write_state, json.dumps(self._state))
 
-    def _load_mode(self):
-        """Load persisted mode from disk."""
+    def _write_state(self, data: str):
+        """Write serialized state to disk atomically (blocking)."""
         try:
-            if os.path.exists(MODE_FILE):
-                with open(MODE_FILE, 'r') as f:
-                    mode = f.read().strip()
-                    if mode in ("sonos", "hue"):
-                        self._mode = mode
-                        logger.info(f"Loaded mode from disk: {self._mode}")
+            with self._state_lock:
+                write_file_atomic(STATE_FILE, data)
         except Exception as e:
-            logger.debug(f"Could not load mode: {e}")
-
-    def _save_mode(self):
-        """Persist current mode to disk."""
+            logger.debug("Could not save state: %s", e)
+
+    def _restore_last_speaker(self):
+        """
+        Restore the persisted speaker.
+        With a saved IP the speaker is usable immediately, before discovery finishes.
+        """
+        saved = self._state.get("speaker")
+        if not isinstance(saved, dict):
+            return
+        self._last_speaker_name = saved.get("name")
+        self._last_speaker_uid = saved.get("uid")
+        self._last_speaker_ip = saved.get("ip")
         try:
-            with open(MODE_FILE, 'w') as f:
-                f.write(self._mode)
+            if saved.get("ip"):
+                self._last_speaker = speaker_from_ip(saved["ip"])
+                self._update_target()
         except Exception as e:
-            logger.debug(f"Could not save mode: {e}")
-
-    def _load_hue_zone(self):
-        """Load persisted Hue zone from disk."""
+            logger.debug("Could not restore last speaker: %s", e)
+        if self._last_speaker_name:
+            logger.info(f"Loaded last speaker from disk: {self._last_speaker_name}")
+
+    def _save_last_speaker(self, speaker, name: Optional[str] = None):
+        """Persist speaker identity (UID, IP, name); the name comes from the caller or the name cache."""
+        name = name or self._speaker_names.get(speaker.uid)
+        self._last_speaker_name = name
+        self._last_speaker_uid = speaker.uid
+        self._last_speaker_ip = speaker.ip_address
+        self._set_state("speaker", {"uid": speaker.uid, "ip": speaker.ip_address, "name": name})
+
+    def _is_new_last_speaker(self, speaker) -> bool:
+        """Check whether speaker differs from the persisted one (so steady-state polls don't rewrite it)."""
+        return speaker.uid != self._last_speaker_uid or speaker.ip_address != self._last_speaker_ip
+
+    def _verify_last_speaker(self):
+        """Check the speaker restored from disk is still the same device at that IP (blocking)."""
+        speaker = self._last_speaker
+        if speaker is None or not self._last_speaker_uid:
+            return
         try:
-            if os.path.exists(HUE_ZONE_FILE):
-                with open(HUE_ZONE_FILE, 'r') as f:
-                    zone = f.read().strip()
-                    if zone in HUE_ZONES:
-                        self._hue_zone = zone
-                        logger.info(f"Loaded Hue zone from disk: {self._hue_zone}")
+            if speaker.uid == self._last_speaker_uid:
+                # Saved by IP, so it may have joined a group since; commands must go to the coordinator
+                self._resolve_last_speaker(speaker)
+                return
+            logger.info(f"Speaker at {speaker.ip_address} is no longer {self._last_speaker_name}")
         except Exception as e:
-            logger.debug(f"Could not load Hue zone: {e}")
-
-    def _save_hue_zone(self):
-        """Persist current Hue zone to disk."""
+            logger.debug("Saved speaker %s unreachable: %s", self._last_speaker_name, e)
+        if self._last_speaker is speaker:
+            self._last_speaker = None  # Fall back to recovery after discovery
+            self._loop.call_soon_threadsafe(self._update_target)
+
+    def _resolve_last_speaker(self, speaker):
+        """Make speaker's group coordinator the last speaker (blocking topology lookup, runs in a thread)."""
+        coordinator = self._resolve_coordinator(speaker)
+        self._loop.call_soon_threadsafe(self._set_last_speaker, coordinator)
+
+    def _resolve_coordinator(self, speaker):
+        """speaker's group coordinator, with its name cached (blocking topology lookups, runs in a thread)."""
+        coordinator = coordinator_of(speaker)
+        self._learn_name(coordinator)
+        return coordinator
+
+    def _learn_name(self, speaker) -> Optional[str]:
+        """Read and cache speaker's player name (blocking: SoCo may query the zone topology)."""
         try:
-            with open(HUE_ZONE_FILE, 'w') as f:
-                f.write(self._hue_zone)
+            name = speaker.player_name
         except Exception as e:
-            logger.debug(f"Could not save Hue zone: {e}")
-
-    def _get_target_speaker(self):
-        """Get the speaker to control: active speaker, or last known speaker."""
-        return self.active_speaker or self._last_speaker
-
-    def _on_volume_up(self):
-        """Handle dial rotation clockwise."""
-        if self._mode == "sonos":
-            self._sonos_volume_up()
-        else:
-            self._hue_brightness_up()
-
-    def _on_volume_down(self):
-        """Handle dial rotation counter-clockwise."""
+            logger.debug("Could not read name of %s: %s", speaker.ip_address, e)
+            return self._speaker_names.get(speaker.uid)
+        self._speaker_names[speaker.uid] = name
+        return name
+
+    def _speaker_name(self, speaker) -> str:
+        """Cached player name for logging, falling back to the IP (never blocks)."""
+        return self._speaker_names.get(speaker.uid) or speaker.ip_address
+
+    def _set_last_speaker(self, speaker):
+        """Adopt an already resolved coordinator as the last speaker (event loop thread)."""
+        self._last_speaker = speaker
+        self._update_target()
+
+    def _restore_mode(self):
+        """Restore the persisted mode."""
+        mode = self._state.get("mode")
+        if mode in ("sonos", "hue"):
+            self._mode = mode
+            logger.info(f"Loaded mode from disk: {self._mode}")
+
+    def _restore_hue_zone(self):
+        """Restore the persisted Hue zone."""
+        zone = self._state.get("hue_zone")
+        if zone in _NEXT_HUE_ZONE:
+            self._hue_zone = zone
+            logger.info(f"Loaded Hue zone from disk: {self._hue_zone}")
+
+    def _update_target(self):
+        """
+        Recompute the speaker to control; call after changing active_speaker or _last_speaker.
+        Dial handlers read only _target_speaker, so they never see one field changed without the other.
+        """
+        self._target_speaker = self.active_speaker or self._last_speaker
+
+    def _note_dial_activity(self):
+        """Record dial use; the first event after an idle spell wakes the poller for a prompt re-check."""
+        now = self._loop.time()
+        if now - self._last_dial_ts >= DIAL_ACTIVITY_WINDOW:
+            self._poll_wake.set()
+        self._last_dial_ts = now
+
+    def _on_volume_delta(self, ticks: int):
+        """Handle a batch of dial rotation ticks (positive = clockwise)."""
+        self._note_dial_activity()
         if self._mode == "sonos":
-            self._sonos_volume_down()
+            if self._target_speaker is not None:
+                self._sonos_volume.add(ticks * VOLUME_STEP)
+            else:
+                logger.debug("No speaker to control, ignoring volume change")
         else:
-            self._hue_brightness_down()
+            if self._hue_bridge:
+                self._hue_brightness.add(ticks * HUE_BRIGHTNESS_STEP)
+            else:
+                logger.debug("No Hue bridge connected, ignoring brightness change")
 
     def _on_press(self):
         """Handle dial single press."""
+        self._note_dial_activity()
         if self._mode == "sonos":
             self._sonos_toggle_playback()
         else:
@@ -169,10 +344,11 @@ class SonosDialController:
 
     def _on_double_press(self):
         """Handle dial double press -> next track (Sonos) or next zone (Hue)."""
+        self._note_dial_activity()
         if self._mode == "sonos":
-            speaker = self._get_target_speaker()
+            speaker = self._target_speaker
             if speaker:
-                next_track(speaker)
+                self._loop.create_task(self._run_sonos_command(next_track, speaker))
             else:
                 logger.debug("No speaker to control, ignoring double press")
         else:
@@ -180,10 +356,11 @@ class SonosDialController:
 
     def _on_triple_press(self):
         """Handle dial triple press -> previous track (Sonos only)."""
+        self._note_dial_activity()
         if self._mode == "sonos":
-            speaker = self._get_target_speaker()
+            speaker = self._target_speaker
             if speaker:
-                previous_track(speaker)
+                self._loop.create_task(self._run_sonos_command(previous_track, speaker))
             else:
                 logger.debug("No speaker to control, ignoring triple press")
 
@@ -192,260 +369,354 @@ class SonosDialController:
         logger.debug("Quadruple click detected")
         old_mode = self._mode
         self._mode = "hue" if self._mode == "sonos" else "sonos"
-        self._save_mode()
+        self._set_state("mode", self._mode)
         logger.info(f"Mode switched: {old_mode} -> {self._mode}")
 
         # Flash all Hue zones for feedback
         if self._hue_bridge:
             if self._mode == "hue":
                 # Sonos -> Hue: double flash
-                asyncio.create_task(self._flash_all_zones(count=2))
+                self._loop.create_task(self._flash_all_zones(count=2))
             else:
                 # Hue -> Sonos: single flash
-                asyncio.create_task(self._flash_all_zones(count=1))
+                self._loop.create_task(self._flash_all_zones(count=1))
         else:
             logger.warning("No Hue bridge connected, cannot flash")
 
     # Sonos-specific handlers
 
-    def _sonos_volume_up(self):
-        """Sonos: increase volume (throttled)."""
-        speaker = self._get_target_speaker()
-        if speaker:
-            self._queue_sonos_volume(VOLUME_STEP)
-        else:
-            logger.debug("No speaker to control, ignoring volume up")
-
-    def _sonos_volume_down(self):
-        """Sonos: decrease volume (throttled)."""
-        speaker = self._get_target_speaker()
-        if speaker:
-            self._queue_sonos_volume(-VOLUME_STEP)
-        else:
-            logger.debug("No speaker to control, ignoring volume down")
-
-    def _queue_sonos_volume(self, delta: int):
-        """Accumulate volume delta with throttling (max ~7 updates/sec)."""
-        import time
-        self._sonos_volume_delta += delta
-        now = time.time()
-        throttle_interval = 0.15  # 150ms between sends
-
-        # If enough time passed, send immediately
-        if now - self._sonos_last_send_time >= throttle_interval:
-            self._sonos_last_send_time = now
-            accumulated = self._sonos_volume_delta
-            self._sonos_volume_delta = 0
-            asyncio.create_task(self._send_sonos_volume(accumulated))
-        else:
-            # Schedule trailing send to catch final value
-            if self._sonos_volume_task and not self._sonos_volume_task.done():
-                self._sonos_volume_task.cancel()
-            self._sonos_volume_task = asyncio.create_task(self._trailing_sonos_volume())
-
     async def _send_sonos_volume(self, delta: int):
-        """Send volume adjustment to Sonos speaker."""
-        speaker = self._get_target_speaker()
-        if speaker:
-            if DRY_RUN:
-                logger.info(f"[DRY-RUN] Would adjust volume by {delta:+d} on {speaker.player_name}")
-                return
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, adjust_volume, speaker, delta)
-
-    async def _trailing_sonos_volume(self):
-        """Wait then send any remaining accumulated volume."""
-        import time
-        await asyncio.sleep(0.15)
+        """Hand a volume adjustment to the Sonos volume worker."""
+        if DRY_RUN:
+            logger.info(f"[DRY-RUN] Would adjust volume by {delta:+d}")
+            return
+        self._sonos_volume_worker.put(delta)
 
-        if self._sonos_volume_delta != 0:
-            self._sonos_last_send_time = time.time()
-            delta = self._sonos_volume_delta
-            self._sonos_volume_delta = 0
-            await self._send_sonos_volume(delta)
+    def _apply_sonos_volume(self, delta: int):
+        """Adjust the target speaker's volume (blocking, runs on the Sonos volume worker)."""
+        # Resolved here, at send time, so a speaker change mid-burst is honoured. Every path that
+        # assigns active_speaker or _last_speaker resolves the group coordinator first (events,
+        # probes, restore verification, mDNS, recovery), so no .group.coordinator walk is needed per send.
+        speaker = self._target_speaker
+        if speaker is not None:
+            adjust_volume(speaker, delta)
 
     def _sonos_toggle_playback(self):
         """Sonos: toggle play/pause."""
-        speaker = self._get_target_speaker()
+        speaker = self._target_speaker
         if speaker:
-            toggle_playback(speaker)
+            self._loop.create_task(self._run_sonos_command(toggle_playback, speaker))
         else:
             logger.debug("No speaker to control, ignoring press")
 
+    async def _run_sonos_command(self, command, speaker):
+        """Run a blocking Sonos command in the Sonos thread pool so dial input stays responsive."""
+        try:
+            await self._loop.run_in_executor(self._sonos_exec, command, speaker)
+        except Exception:
+            # Expected speaker errors are handled in sonos_control; anything reaching here is a bug
+            logger.exception(f"Unexpected error in {command.__name__}")
+
     # Hue-specific handlers
 
     def _hue_next_zone(self):
         """Cycle to the next Hue zone."""
-        try:
-            current_idx = HUE_ZONES.index(self._hue_zone)
-            next_idx = (current_idx + 1) % len(HUE_ZONES)
-        except ValueError:
-            next_idx = 0
-
         old_zone = self._hue_zone
-        self._hue_zone = HUE_ZONES[next_idx]
-        self._save_hue_zone()
+        self._hue_zone = _NEXT_HUE_ZONE.get(old_zone, HUE_ZONES[0])
+        self._set_state("hue_zone", self._hue_zone)
         logger.info(f"Hue zone changed: {old_zone} -> {self._hue_zone}")
 
         # Flash the new zone to confirm
         if self._hue_bridge:
-            asyncio.create_task(self._flash_zone_change())
+            self._loop.create_task(self._flash_zone_change())
 
     async def _flash_zone_change(self):
         """Brief dim-then-brighten to indicate zone change."""
-        loop = asyncio.get_event_loop()
         # Dim down
-        await loop.run_in_executor(
-            None, adjust_brightness, self._hue_bridge, self._hue_zone, -50
+        await asyncio.to_thread(
+            nudge_brightness, self._hue_bridge, self._hue_zone, -50
         )
         await asyncio.sleep(0.15)
         # Brighten back up
-        await loop.run_in_executor(
-            None, adjust_brightness, self._hue_bridge, self._hue_zone, 50
+        await asyncio.to_thread(
+            nudge_brightness, self._hue_bridge, self._hue_zone, 50
         )
 
-    def _hue_brightness_up(self):
-        """Hue: increase brightness (debounced)."""
-        if self._hue_bridge:
-            self._queue_hue_brightness(HUE_BRIGHTNESS_STEP)
-        else:
-            logger.debug("No Hue bridge connected, ignoring brightness up")
-
-    def _hue_brightness_down(self):
-        """Hue: decrease brightness (debounced)."""
-        if self._hue_bridge:
-            self._queue_hue_brightness(-HUE_BRIGHTNESS_STEP)
-        else:
-            logger.debug("No Hue bridge connected, ignoring brightness down")
-
-    def _queue_hue_brightness(self, delta: int):
-        """Accumulate brightness delta with throttling (max ~7 updates/sec)."""
-        import time
-        self._hue_brightness_delta += delta
-        now = time.time()
-        throttle_interval = 0.15  # 150ms between sends
-
-        # If enough time passed, send immediately
-        if now - self._hue_last_send_time >= throttle_interval:
-            self._hue_last_send_time = now
-            accumulated = self._hue_brightness_delta
-            self._hue_brightness_delta = 0
-            asyncio.create_task(self._send_hue_brightness(accumulated))
-        else:
-            # Schedule trailing send to catch final value
-            if self._hue_brightness_task and not self._hue_brightness_task.done():
-                self._hue_brightness_task.cancel()
-            self._hue_brightness_task = asyncio.create_task(self._trailing_hue_brightness())
-
     def _hue_toggle(self):
         """Hue: toggle on/off."""
         if self._hue_bridge:
-            asyncio.create_task(self._async_hue_toggle())
+            self._loop.create_task(self._async_hue_toggle())
         else:
             logger.debug("No Hue bridge connected, ignoring toggle")
 
     async def _send_hue_brightness(self, delta: int):
-        """Send brightness adjustment to Hue bridge."""
+        """Hand a brightness adjustment to the Hue brightness worker."""
         if DRY_RUN:
             logger.info(f"[DRY-RUN] Would adjust Hue brightness by {delta:+d} on {self._hue_zone}")
             return
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None, adjust_brightness, self._hue_bridge, self._hue_zone, delta
-        )
+        self._hue_brightness_worker.put(delta)
 
-    async def _trailing_hue_brightness(self):
-        """Wait then send any remaining accumulated brightness."""
-        import time
-        await asyncio.sleep(0.15)
-
-        if self._hue_brightness_delta != 0:
-            self._hue_last_send_time = time.time()
-            delta = self._hue_brightness_delta
-            self._hue_brightness_delta = 0
-            await self._send_hue_brightness(delta)
+    def _apply_hue_brightness(self, delta: int):
+        """Adjust the current zone's brightness (blocking, runs on the Hue brightness worker)."""
+        adjust_brightness(self._hue_bridge, self._hue_zone, delta)
 
     async def _async_hue_toggle(self):
         """Async wrapper for Hue toggle."""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None, toggle_zone, self._hue_bridge, self._hue_zone
+        await asyncio.to_thread(
+            toggle_zone, self._hue_bridge, self._hue_zone
         )
 
     async def _flash_all_zones(self, count: int = 1):
         """Flash all Hue zones for mode switch feedback."""
-        loop = asyncio.get_event_loop()
-        logger.debug(f"Flashing all zones {count}x: {HUE_ZONES}")
+        logger.debug("Flashing all zones %sx: %s", count, HUE_ZONES)
 
         for i in range(count):
-            # Dim all zones simultaneously
-            await asyncio.gather(*[
-                loop.run_in_executor(
-                    None, adjust_brightness, self._hue_bridge, zone, -50
-                )
-                for zone in HUE_ZONES
-            ])
+            # Dim all zones (one thread hop for the whole batch)
+            await asyncio.to_thread(nudge_all_zones, self._hue_bridge, HUE_ZONES, -50)
             await asyncio.sleep(0.15)
-            # Brighten all zones simultaneously
-            await asyncio.gather(*[
-                loop.run_in_executor(
-                    None, adjust_brightness, self._hue_bridge, zone, 50
-                )
-                for zone in HUE_ZONES
-            ])
+            # Brighten all zones
+            await asyncio.to_thread(nudge_all_zones, self._hue_bridge, HUE_ZONES, 50)
             if i < count - 1:
                 await asyncio.sleep(0.08)  # Gap between flashes
 
+    async def _discover(self) -> list:
+        """
+        Discover speakers and index them by UID and name.
+        Tries an async SSDP search first; SoCo's blocking search (which tries every interface) is the fallback.
+        """
+        speakers = await discover_speakers_async()
+        if not speakers:
+            speakers = await asyncio.to_thread(discover_speakers)
+        if speakers:
+            await asyncio.to_thread(self._index_speakers, speakers)
+        return speakers
+
+    def _index_speakers(self, speakers: list):
+        """Rebuild the UID and name indexes (blocking: reading names may query the topology)."""
+        self._by_uid = {speaker.uid: speaker for speaker in speakers}
+        self._by_name = {self._learn_name(speaker): speaker.uid for speaker in speakers}
+
+    def _on_speaker_added(self, speaker, name: str):
+        """mDNS reported a speaker (called on zeroconf's thread); hand it to the event loop."""
+        self._loop.call_soon_threadsafe(self._add_speaker, speaker, name)
+
+    def _on_speaker_removed(self, uid: str):
+        """mDNS reported a speaker going away (called on zeroconf's thread)."""
+        self._loop.call_soon_threadsafe(self._remove_speaker, uid)
+
+    def _add_speaker(self, speaker, name: str):
+        """Add a speaker found by mDNS to the known set and subscribe to its events."""
+        known = self._by_uid.get(speaker.uid)
+        if known is not None and known.ip_address == speaker.ip_address:
+            return
+        logger.info(f"Speaker appeared: {name}")
+        self._by_uid[speaker.uid] = speaker
+        self._by_name[name] = speaker.uid
+        self._speaker_names[speaker.uid] = name
+        self.speakers = [s for s in self.speakers if s.uid != speaker.uid] + [speaker]
+        self._speakers_cache_ts = time.monotonic()  # mDNS just confirmed the list is current
+        if speaker.uid == self._last_speaker_uid and (
+            self._last_speaker is None or self._last_speaker.ip_address != speaker.ip_address
+        ):
+            # The saved speaker (re)appeared, maybe at a new IP; adopt its coordinator
+            self._loop.run_in_executor(None, self._resolve_last_speaker, speaker)
+        self._loop.run_in_executor(None, self._sync_subscriptions)
+
+    def _remove_speaker(self, uid: str):
+        """Drop a speaker that stopped advertising over mDNS."""
+        speaker = self._by_uid.pop(uid, None)
+        if speaker is None:
+            return
+        logger.info(f"Speaker went away: {speaker.ip_address}")
+        self.speakers = [s for s in self.speakers if s.uid != uid]
+        self._by_name = {name: u for name, u in self._by_name.items() if u != uid}
+        if self.active_speaker is not None and self.active_speaker.uid == uid:
+            self.active_speaker = None
+            self._update_target()
+        self._loop.run_in_executor(None, self._sync_subscriptions)
+
+    def _sync_subscriptions(self):
+        """Subscribe to transport events on newly discovered speakers (blocking, runs in thread pool)."""
+        with self._subscriptions_lock:
+            current = {speaker.uid: speaker for speaker in self.speakers}
+            for uid in list(self._subscriptions):
+                if uid not in current:
+                    unsubscribe(self._subscriptions.pop(uid))
+
+            for uid, speaker in current.items():
+                if uid in self._subscriptions:
+                    continue
+                subscription = subscribe_transport_events(
+                    speaker,
+                    self._on_transport_event,
+                    lambda e, uid=uid: self._subscriptions.pop(uid, None),  # Resubscribe on next resync
+                )
+                if subscription:
+                    self._subscriptions[uid] = subscription
+
+    def _start_browsing(self):
+        """
+        Start mDNS browsing (blocking, runs in a thread).
+        The instance is stored or closed here rather than by the awaiting coroutine: if shutdown
+        cancels startup meanwhile, this thread still finishes and nothing else would close it.
+        """
+        zc = browse_speakers(self._on_speaker_added, self._on_speaker_removed)
+        if zc is None:
+            return
+        with self._subscriptions_lock:
+            if self._shutdown.is_set():
+                zc.close()  # _unsubscribe_all may already have run
+            else:
+                self._zeroconf = zc
+
+    def _unsubscribe_all(self):
+        """Cancel all transport event subscriptions and stop mDNS browsing (blocking)."""
+        with self._subscriptions_lock:
+            if self._zeroconf is not None:
+                self._zeroconf.close()
+                self._zeroconf = None
+            while self._subscriptions:
+                _, subscription = self._subscriptions.popitem()
+                unsubscribe(subscription)
+
+    def _on_transport_event(self, event):
+        """Handle a pushed AVTransport event (called on SoCo's event listener thread)."""
+        state = event.variables.get("transport_state")
+        # Resolve coordinator and name here, off the event loop - both may need a topology query
+        coordinator = coordinator_of(event.service.soco)
+
+        if state == "PLAYING":
+            name = self._learn_name(coordinator)
+            self._loop.call_soon_threadsafe(self._set_active_speaker, coordinator, name)
+        elif state in ("PAUSED_PLAYBACK", "STOPPED"):
+            self._loop.call_soon_threadsafe(self._clear_active_speaker, coordinator)
+
+    def _set_active_speaker(self, speaker, name: Optional[str]):
+        """Mark speaker as the one currently playing; name was read on the listener thread."""
+        if self.active_speaker is None or self.active_speaker.uid != speaker.uid:
+            logger.info(f"Active speaker: {name or speaker.ip_address} (event)")
+        self.active_speaker = speaker
+        # Remember this speaker for when playback stops
+        self._last_speaker = speaker
+        self._target_speaker = speaker
+        if self._is_new_last_speaker(speaker):
+            self._save_last_speaker(speaker, name)
+
+    def _clear_active_speaker(self, speaker):
+        """Playback stopped on speaker; keep it as the last speaker."""
+        if self.active_speaker is not None and self.active_speaker.uid == speaker.uid:
+            logger.debug("Playback stopped, using last: %s", self._speaker_name(speaker))
+            self.active_speaker = None
+            self._update_target()
+
+    async def _probe_active_speaker(self, speakers: list):
+        """Ask each speaker whether it is playing, concurrently; slow or unreachable ones are skipped."""
+        states = await asyncio.gather(
+            *(get_transport_state_async(s.ip_address, ACTIVE_PROBE_TIMEOUT) for s in speakers)
+        )
+        # Walk in speaker order so the choice is stable when several groups are playing
+        for speaker, state in zip(speakers, states):
+            if state == "PLAYING":
+                try:
+                    return await asyncio.wait_for(asyncio.to_thread(self._resolve_coordinator, speaker), ACTIVE_PROBE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    return speaker  # Same fallback coordinator_of uses when the topology lookup fails
+        return None
+
     async def _poll_active_speaker(self):
-        """Periodically check for active speaker."""
-        loop = asyncio.get_event_loop()
-        prev_active_name = None  # Track changes to reduce log noise
+        """
+        Periodically check for active speaker.
+        Speakers with a live transport event subscription push their own state, so only the
+        rest are probed; once everything is subscribed this is just a rediscovery and
+        resubscription watchdog.
+        """
+        prev_active_uid = None  # Track changes to reduce log noise
         prev_had_speakers = True  # Assume we have speakers initially
-        while self._running:
+        while not self._shutdown.is_set():
+            self._poll_wake.clear()
+            if self.speakers and all(s.uid in self._subscriptions for s in self.speakers):
+                # Every speaker pushes its own state; polling is only a resync watchdog
+                interval = EVENT_RESYNC_INTERVAL
+            elif self._loop.time() - self._last_dial_ts < DIAL_ACTIVITY_WINDOW:
+                interval = ACTIVE_SPEAKER_FAST_POLL_INTERVAL
+            else:
+                interval = ACTIVE_SPEAKER_IDLE_POLL_INTERVAL
             try:
-                # Run blocking Sonos calls in thread pool with timeout
-                self.speakers = await asyncio.wait_for(
-                    loop.run_in_executor(None, discover_speakers),
-                    timeout=10.0
-                )
+                # Only rediscover when the cached speaker list is empty, or stale and mDNS isn't keeping it current
+                stale = time.monotonic() - self._speakers_cache_ts >= SPEAKER_CACHE_TTL
+                if not self.speakers or (stale and self._zeroconf is None):
+                    # Run blocking Sonos calls in thread pool with timeout
+                    speakers = await asyncio.wait_for(self._discover(), timeout=15.0)
+                    if speakers:
+                        self.speakers = speakers
+                        self._speakers_cache_ts = time.monotonic()
+                        self._discover_backoff = ACTIVE_SPEAKER_POLL_INTERVAL
+                    elif self.speakers:
+                        # Likely a network glitch - keep using the speakers we already know,
+                        # and treat the cache as expiring again after the backoff
+                        logger.debug("Discovery returned no speakers, keeping cached list")
+                        self._speakers_cache_ts = time.monotonic() - SPEAKER_CACHE_TTL + self._discover_backoff
+                        self._discover_backoff = min(self._discover_backoff * 2, DISCOVERY_MAX_BACKOFF)
+
                 if not self.speakers:
                     if prev_had_speakers:
                         logger.warning("No Sonos speakers found on network")
                         prev_had_speakers = False
                     self.active_speaker = None
+                    # Back off exponentially instead of hammering SSDP while the network has nothing
+                    interval = self._discover_backoff
+                    self._discover_backoff = min(self._discover_backoff * 2, DISCOVERY_MAX_BACKOFF)
                 else:
                     prev_had_speakers = True
-                    self.active_speaker = await asyncio.wait_for(
-                        loop.run_in_executor(None, get_active_speaker, self.speakers),
-                        timeout=10.0
-                    )
+                    unsubscribed = [s for s in self.speakers if s.uid not in self._subscriptions]
+                    if unsubscribed:
+                        playing = await self._probe_active_speaker(unsubscribed)
+                        if playing is not None:
+                            self.active_speaker = playing
+                        elif self.active_speaker is not None and self.active_speaker.uid not in self._subscriptions:
+                            self.active_speaker = None  # Probed and no longer playing
                     if self.active_speaker:
                         # Log only when active speaker changes
-                        if self.active_speaker.player_name != prev_active_name:
-                            logger.info(f"Active speaker: {self.active_speaker.player_name}")
-                            prev_active_name = self.active_speaker.player_name
+                        if self.active_speaker.uid != prev_active_uid:
+                            logger.info(f"Active speaker: {self._speaker_name(self.active_speaker)}")
+                            prev_active_uid = self.active_speaker.uid
                         # Remember this speaker for when playback stops
                         self._last_speaker = self.active_speaker
-                        self._save_last_speaker_name(self.active_speaker.player_name)
+                        if self._is_new_last_speaker(self.active_speaker):
+                            self._save_last_speaker(self.active_speaker)
                     elif self._last_speaker:
-                        if prev_active_name is not None:
-                            logger.debug(f"Playback stopped, using last: {self._last_speaker.player_name}")
-                            prev_active_name = None
-                    elif self._last_speaker_name and not self._last_speaker:
-                        # Try to recover speaker from persisted name
-                        for speaker in self.speakers:
-                            if speaker.player_name == self._last_speaker_name:
-                                self._last_speaker = speaker.group.coordinator
-                                logger.info(f"Recovered last speaker from disk: {self._last_speaker.player_name}")
-                                break
-                        prev_active_name = None
+                        if prev_active_uid is not None:
+                            logger.debug("Playback stopped, using last: %s", self._speaker_name(self._last_speaker))
+                            prev_active_uid = None
+                    elif (self._last_speaker_uid or self._last_speaker_name) and not self._last_speaker:
+                        # Try to recover speaker from persisted UID (or name, for older state files)
+                        uid = self._last_speaker_uid
+                        if uid not in self._by_uid:
+                            uid = self._by_name.get(self._last_speaker_name)
+                        speaker = self._by_uid.get(uid)
+                        if speaker is not None:
+                            self._last_speaker = await asyncio.to_thread(self._resolve_coordinator, speaker)
+                            logger.info(f"Recovered last speaker from disk: {self._speaker_name(self._last_speaker)}")
+                        prev_active_uid = None
+
+                # Publish this cycle's outcome to the dial handlers in one assignment
+                self._update_target()
+                if self.speakers:
+                    await asyncio.wait_for(
+                        asyncio.to_thread(self._sync_subscriptions),
+                        timeout=10.0
+                    )
 
             except asyncio.TimeoutError:
                 logger.warning("Sonos polling timed out - will retry")
             except Exception as e:
                 logger.error(f"Error polling speakers: {e}")
 
-            await asyncio.sleep(ACTIVE_SPEAKER_POLL_INTERVAL)
+            # Sleep until the next poll, waking early on renewed dial use (shutdown cancels this task via _serve)
+            try:
+                await asyncio.wait_for(self._poll_wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
 
     async def _initialize_hue(self):
         """Initialize Hue bridge connection."""
@@ -453,20 +724,24 @@ class SonosDialController:
             logger.info("phue not installed - Hue control disabled")
             return
 
-        loop = asyncio.get_event_loop()
-
         # Discover bridge
         logger.info("Discovering Hue bridge...")
-        bridge_ip = await loop.run_in_executor(None, discover_bridge)
+        bridge_ip = await asyncio.to_thread(discover_bridge)
         if not bridge_ip:
             logger.warning("No Hue bridge found - Hue control disabled")
             return
 
         # Connect to bridge
         try:
-            self._hue_bridge = await loop.run_in_executor(
-                None, connect_bridge, bridge_ip
+            self._hue_bridge = await asyncio.to_thread(
+                connect_bridge, bridge_ip
             )
+            if self._hue_bridge is None and await asyncio.to_thread(forget_cached_bridge_ip, bridge_ip):
+                # The cached IP answered but isn't our bridge any more (e.g. DHCP reassigned it)
+                logger.info("Cached Hue bridge IP failed to connect, rediscovering...")
+                bridge_ip = await asyncio.to_thread(discover_bridge)
+                if bridge_ip:
+                    self._hue_bridge = await asyncio.to_thread(connect_bridge, bridge_ip)
             if self._hue_bridge:
                 logger.info(f"Hue bridge connected at {bridge_ip}, default zone: {self._hue_zone}")
         except Exception as e:
@@ -474,82 +749,135 @@ class SonosDialController:
             logger.info("Press the Hue bridge button and restart the service to pair")
 
     async def run(self):
-        """Start the controller."""
+        """Start the controller and run until stop() is called (or the dial can't be connected)."""
+        if self._running:
+            logger.warning("Controller is already running")
+            return
         self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._shutdown.clear()
         logger.info("Starting Sonos Dial Controller")
+
+        # Whichever finishes first wins: startup + serving, or a shutdown request (which cancels the other)
+        serve = self._loop.create_task(self._serve())
+        shutdown = self._loop.create_task(self._shutdown.wait())
+        try:
+            await asyncio.wait((serve, shutdown), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            logger.info("Controller cancelled")
+            raise  # Clean up below, but let the caller see its cancellation
+        finally:
+            for task in (serve, shutdown):
+                task.cancel()
+            await asyncio.gather(serve, shutdown, return_exceptions=True)
+            self._shutdown.set()
+            self.dial.stop()
+            self._sonos_volume.cancel()
+            self._hue_brightness.cancel()
+            try:
+                await asyncio.wait_for(asyncio.to_thread(self._unsubscribe_all), timeout=3.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            if self._state_flush is not None:
+                # Write out pending state changes before exiting
+                self._state_flush.cancel()
+                self._state_flush = None
+                await asyncio.to_thread(self._write_state, json.dumps(self._state))
+            self._stop_workers()
+            self._running = False
+            logger.info("Controller stopped")
+        if not serve.cancelled():
+            serve.result()  # Re-raise whatever made the controller fail
+
+    def _start_workers(self):
+        """Create and start this run's worker threads and Sonos command pool."""
+        # Dial-triggered Sonos commands get their own small pool, so they never queue
+        # behind discovery or polling work on the default executor
+        self._sonos_exec = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="sonos")
+        # Volume and brightness calls run one at a time on their own threads, summing anything that queues up meanwhile
+        self._sonos_volume_worker = DeltaWorker(self._apply_sonos_volume, "sonos-volume")
+        self._hue_brightness_worker = DeltaWorker(self._apply_hue_brightness, "hue-brightness")
+        self._sonos_volume_worker.start()
+        self._hue_brightness_worker.start()
+
+    def _stop_workers(self):
+        """Stop whatever _start_workers() started (startup may have failed before it ran)."""
+        if self._sonos_exec is not None:
+            self._sonos_exec.shutdown(wait=False)
+            self._sonos_exec = None
+        for worker in (self._sonos_volume_worker, self._hue_brightness_worker):
+            if worker is not None:
+                worker.stop()
+        self._sonos_volume_worker = None
+        self._hue_brightness_worker = None
+
+    async def _serve(self):
+        """Start up (state, discovery, Hue, dial), then run dial input and speaker polling."""
+        # State files are read here rather than in __init__, off the event loop
+        await asyncio.to_thread(self._load_state)
         logger.info(f"Current mode: {self._mode}")
 
-        loop = asyncio.get_event_loop()
+        # The speaker restored from disk is already usable; confirm its identity in the background
+        self._loop.run_in_executor(None, self._verify_last_speaker)
 
         # Initial Sonos discovery (run in thread to not block, with timeout)
         logger.info("Discovering Sonos speakers...")
         try:
             self.speakers = await asyncio.wait_for(
-                loop.run_in_executor(None, discover_speakers),
+                self._discover(),
                 timeout=15.0  # Don't let discovery hang startup
             )
             if self.speakers:
-                logger.info(f"Found {len(self.speakers)} speaker(s): {[s.player_name for s in self.speakers]}")
+                self._speakers_cache_ts = time.monotonic()
+                logger.info("Found %d speaker(s): %s", len(self.speakers), [self._speaker_name(s) for s in self.speakers])
             else:
                 logger.warning("No Sonos speakers found - will keep trying")
         except asyncio.TimeoutError:
             logger.warning("Sonos discovery timed out - will keep trying in background")
             self.speakers = []
 
+        # Watch mDNS so speakers added or removed later are picked up without SSDP polling
+        await asyncio.to_thread(self._start_browsing)
+
         # Initialize Hue
         await self._initialize_hue()
 
+        self._start_workers()
+
         # Connect to dial
         if not self.dial.connect():
             if not self._use_mock_dial:
                 logger.error("Failed to connect to dial - is the 2.4G receiver plugged in?")
                 return
 
-        # Run dial input and speaker polling concurrently
-        try:
-            await asyncio.gather(
-                self.dial.run(),
-                self._poll_active_speaker(),
-            )
-        except asyncio.CancelledError:
-            logger.info("Controller cancelled")
-        finally:
-            self._running = False
-            self.dial.stop()
-            logger.info("Controller stopped")
+        # Run dial input and speaker polling concurrently; if either fails, the other is cancelled
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self.dial.run())
+            tg.create_task(self._poll_active_speaker())
 
     def stop(self):
-        """Stop the controller."""
-        self._running = False
-        self.dial.stop()
+        """Request shutdown (safe to use directly as a loop signal handler)."""
+        logger.info("Received shutdown signal, stopping...")
+        self._shutdown.set()
 
 
 async def async_main():
     """Async entry point with proper signal handling."""
     # Check for mock mode (for local development without dial hardware)
-    use_mock = "--mock" in sys.argv or not EVDEV_AVAILABLE
+    evdev_available = importlib.util.find_spec("evdev") is not None  # Locate without importing
+    use_mock = "--mock" in sys.argv or not evdev_available
 
     if use_mock and "--mock" not in sys.argv:
         logger.info("evdev not available, using mock dial input")
 
     controller = SonosDialController(use_mock_dial=use_mock)
-    main_task = None
 
-    # Set up asyncio-compatible signal handlers
+    # Signals are delivered through the event loop, not in an arbitrary thread
     loop = asyncio.get_running_loop()
-
-    def signal_handler():
-        logger.info("Received shutdown signal, stopping...")
-        controller.stop()
-        # Cancel the main task to force immediate exit
-        if main_task and not main_task.done():
-            main_task.cancel()
-
     for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, signal_handler)
+        loop.add_signal_handler(sig, controller.stop)
 
     try:
-        main_task = asyncio.current_task()
         await controller.run()
     except asyncio.CancelledError:
         logger.info("Main task cancelled")
@@ -1,51 +1,322 @@
 """Sonos control using the SoCo library."""
 
-import soco
-from soco import SoCo
-from soco import config as soco_config
-from typing import Optional
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Optional
+import asyncio
+import importlib.util
 import logging
+import queue
+import re
+import socket
 
 from config import VOLUME_STEP
 
+if TYPE_CHECKING:
+    from soco import SoCo
+
+# Located without importing; zeroconf is only loaded once browse_speakers() starts (off the event loop)
+ZEROCONF_AVAILABLE = importlib.util.find_spec("zeroconf") is not None
+
 logger = logging.getLogger(__name__)
 
-# Use shorter timeouts to avoid hanging on unresponsive speakers
-# Default is 20s which causes long hangs and boot loops
-soco_config.REQUEST_TIMEOUT = 3.0
+# mDNS service type Sonos players advertise
+SONOS_MDNS_TYPE = "_sonos._tcp.local."
 
+# SSDP search for Sonos players (same query SoCo's discover() sends)
+_SSDP_ADDRESS = ("239.255.255.250", 1900)
+_SSDP_SEARCH = (
+    "M-SEARCH * HTTP/1.1\r\n"
+    "HOST: 239.255.255.250:1900\r\n"
+    'MAN: "ssdp:discover"\r\n'
+    "MX: 1\r\n"
+    "ST: urn:schemas-upnp-org:device:ZonePlayer:1\r\n"
+    "\r\n"
+).encode()
 
-def discover_speakers() -> list[SoCo]:
-    """Discover all Sonos speakers on the network."""
+# AVTransport GetTransportInfo request, for probing playback state without SoCo
+_TRANSPORT_INFO_BODY = (
+    '<?xml version="1.0"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+    's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body>'
+    '<u:GetTransportInfo xmlns:u="urn:schemas-upnp-org:service:AVTransport:1">'
+    "<InstanceID>0</InstanceID></u:GetTransportInfo></s:Body></s:Envelope>"
+).encode()
+_TRANSPORT_STATE_RE = re.compile(rb"<CurrentTransportState>(\w+)</CurrentTransportState>")
+
+# Track position as reported by Sonos: H:MM:SS (hours may be omitted or more than one digit)
+_POSITION_RE = re.compile(r"(?:(\d+):)?(\d+):(\d+)$")
+
+# SoCo is imported on first use: its import chain (requests, lxml, ...) takes most of a second on a Pi
+_soco = None
+# Errors a speaker command can raise for expected reasons (speaker offline, UPnP fault, timeout);
+# filled in by _import_soco(), which always runs before any SoCo handle exists
+_command_errors: tuple = ()
+
+
+class _KeepAliveRequests:
+    """
+    Stand-in for the requests module inside SoCo: get/post go through one pooled Session,
+    so SOAP calls reuse the speaker's TCP connection instead of opening a new one each time.
+    Everything else (exceptions, etc.) is the real requests module.
+    """
+
+    def __init__(self, requests_module):
+        from requests.adapters import HTTPAdapter
+        self._requests = requests_module
+        self._session = requests_module.Session()
+        # max_retries=1 only retries failed connects (e.g. a pooled socket the speaker closed), never reads
+        self._session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=1))
+
+    def get(self, *args, **kwargs):
+        """requests.get over the shared session."""
+        return self._session.get(*args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        """requests.post over the shared session."""
+        return self._session.post(*args, **kwargs)
+
+    def __getattr__(self, name):
+        """Fall through to the requests module for anything else."""
+        return getattr(self._requests, name)
+
+
+def _import_soco():
+    """Import and configure SoCo once; every SoCo handle is created after this runs."""
+    global _soco, _command_errors
+    if _soco is None:
+        import requests
+        import soco
+        import soco.core
+        import soco.services
+        from soco import config as soco_config
+        from soco.exceptions import SoCoException
+        _command_errors = (SoCoException, requests.RequestException)
+        # Use shorter timeouts to avoid hanging on unresponsive speakers
+        # Default is 20s which causes long hangs and boot loops
+        soco_config.REQUEST_TIMEOUT = 3.0
+        # SoCo calls requests.get/post per command; share keep-alive connections instead
+        keep_alive = _KeepAliveRequests(requests)
+        soco.services.requests = keep_alive
+        soco.core.requests = keep_alive
+        _soco = soco
+    return _soco
+
+
+def _log_command_error(action: str, e: Exception):
+    """Log a failed speaker command; the traceback is only formatted when debug logging is on."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.exception(f"Error {action}")
+    else:
+        logger.error(f"Error {action}: {e}")
+
+
+def _is_sonos(speaker: SoCo) -> bool:
+    """Sanity-check a discovery result: real Sonos players have RINCON_ UIDs."""
     try:
-        speakers = soco.discover(timeout=5)
-        if speakers is None:
-            return []
-        return sorted(list(speakers), key=lambda s: s.player_name)
+        return speaker.uid.startswith("RINCON_")
     except Exception as e:
-        logger.error(f"Error discovering speakers: {e}")
-        return []
+        logger.debug("Dropping discovery result %s: %s", speaker.ip_address, e)
+        return False
 
 
-def get_active_speaker(speakers: list[SoCo]) -> Optional[SoCo]:
+def discover_speakers() -> list[SoCo]:
     """
-    Find the first speaker that is currently playing.
-    Returns the group coordinator if the speaker is part of a group.
+    Discover all Sonos speakers on the network.
+    Non-Sonos devices that answer the SSDP search are filtered out, and an empty
+    result is retried once since a misbehaving device can win the discovery race.
     """
-    for speaker in speakers:
+    soco = _import_soco()
+    for timeout in (5, 3):
         try:
-            transport_info = speaker.get_current_transport_info()
-            state = transport_info.get("current_transport_state", "")
+            speakers = soco.discover(timeout=timeout)
+            speakers = [s for s in (speakers or []) if _is_sonos(s)]
+            if speakers:
+                return sorted(speakers, key=lambda s: s.player_name)
+        except Exception as e:
+            logger.error(f"Error discovering speakers: {e}")
+    return []
+
+
+class _SSDPProtocol(asyncio.DatagramProtocol):
+    """Resolves a future with the address of the first Sonos player answering the search."""
+
+    def __init__(self, found: asyncio.Future):
+        self._found = found
+
+    def datagram_received(self, data: bytes, addr):
+        """Accept the first reply that comes from a Sonos player."""
+        if b"Sonos" in data and not self._found.done():
+            self._found.set_result(addr[0])
+
+
+async def discover_speakers_async(timeout: float = 2.0) -> list[SoCo]:
+    """
+    Discover speakers without tying up a thread for the SSDP wait.
+    Waits on the event loop for the first player to answer, then asks it for the visible zones
+    (one topology request, in a thread). Returns [] if nothing answers within timeout.
+    """
+    loop = asyncio.get_running_loop()
+    found = loop.create_future()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _SSDPProtocol(found), family=socket.AF_INET, local_addr=("0.0.0.0", 0)
+        )
+    except OSError as e:
+        logger.debug("Could not open SSDP socket: %s", e)
+        return []
+    try:
+        transport.sendto(_SSDP_SEARCH, _SSDP_ADDRESS)
+        ip = await asyncio.wait_for(found, timeout)
+    except asyncio.TimeoutError:
+        return []
+    finally:
+        transport.close()
+    return await asyncio.to_thread(_zone_speakers, ip)
+
+
+def _zone_speakers(ip: str) -> list[SoCo]:
+    """All visible speakers in the household of the player at ip, sorted by name (blocking)."""
+    try:
+        speakers = [s for s in speaker_from_ip(ip).visible_zones if _is_sonos(s)]
+        return sorted(speakers, key=lambda s: s.player_name)
+    except Exception as e:
+        logger.error(f"Error listing speakers from {ip}: {e}")
+        return []
 
-            if state == "PLAYING":
-                # Return the group coordinator (controls the whole group)
-                coordinator = speaker.group.coordinator
-                return coordinator
+
+def speaker_from_ip(ip: str) -> SoCo:
+    """Build a SoCo handle for a known IP without running discovery (no network I/O)."""
+    return _import_soco().SoCo(ip)
+
+
+class _SonosBrowseListener:
+    """zeroconf listener that turns mDNS adds/removes into SoCo handles (runs on zeroconf's thread)."""
+
+    def __init__(self, on_added: Callable, on_removed: Callable):
+        self._on_added = on_added
+        self._on_removed = on_removed
+        self._uids = {}  # mDNS service name -> speaker UID, so removals can be reported by UID
+
+    def add_service(self, zc, type_: str, name: str):
+        """Resolve a newly advertised player and report it."""
+        try:
+            info = zc.get_service_info(type_, name, timeout=3000)
+            addresses = info.parsed_addresses() if info else []
+            if not addresses:
+                return
+            speaker = speaker_from_ip(addresses[0])
+            if not _is_sonos(speaker):
+                return
+            self._uids[name] = speaker.uid
+            self._on_added(speaker, speaker.player_name)
         except Exception as e:
-            logger.debug(f"Error checking speaker {speaker.player_name}: {e}")
-            continue
+            logger.debug("Could not resolve mDNS service %s: %s", name, e)
+
+    def remove_service(self, zc, type_: str, name: str):
+        """Report a player that stopped advertising."""
+        uid = self._uids.pop(name, None)
+        if uid:
+            self._on_removed(uid)
+
+    def update_service(self, zc, type_: str, name: str):
+        """Treat an updated record (e.g. new IP) as a fresh add."""
+        self.add_service(zc, type_, name)
+
+
+def browse_speakers(on_added: Callable, on_removed: Callable):
+    """
+    Watch mDNS for Sonos players coming and going, so new speakers show up without SSDP polling.
+    on_added(speaker, name) and on_removed(uid) run on zeroconf's thread, not the asyncio loop.
+    Returns the Zeroconf instance (close it to stop browsing), or None if unavailable.
+    """
+    if not ZEROCONF_AVAILABLE:
+        return None
+    try:
+        from zeroconf import ServiceBrowser, Zeroconf
+        zc = Zeroconf()
+        ServiceBrowser(zc, SONOS_MDNS_TYPE, _SonosBrowseListener(on_added, on_removed))
+        return zc
+    except Exception as e:
+        logger.warning(f"mDNS browsing unavailable: {e}")
+        return None
+
+
+def coordinator_of(speaker: SoCo) -> SoCo:
+    """The speaker's group coordinator (blocking topology lookup); the speaker itself if that fails."""
+    try:
+        return speaker.group.coordinator
+    except Exception as e:
+        logger.debug("Could not resolve coordinator for %s: %s", speaker.ip_address, e)
+        return speaker
 
-    return None
+
+async def get_transport_state_async(ip: str, timeout: float = 2.0) -> Optional[str]:
+    """
+    Ask the player at ip for its transport state ('PLAYING', 'STOPPED', ...) with a raw SOAP call
+    on the event loop, so many speakers can be probed at once without a thread each.
+    Returns None if the speaker doesn't answer within timeout.
+    """
+    request = (
+        "POST /MediaRenderer/AVTransport/Control HTTP/1.1\r\n"
+        f"Host: {ip}:1400\r\n"
+        'Content-Type: text/xml; charset="utf-8"\r\n'
+        'SOAPACTION: "urn:schemas-upnp-org:service:AVTransport:1#GetTransportInfo"\r\n'
+        f"Content-Length: {len(_TRANSPORT_INFO_BODY)}\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    ).encode() + _TRANSPORT_INFO_BODY
+    try:
+        async with asyncio.timeout(timeout):
+            reader, writer = await asyncio.open_connection(ip, 1400)
+            try:
+                writer.write(request)
+                response = await reader.read()  # Server closes the connection after the reply
+            finally:
+                writer.close()
+    except (OSError, TimeoutError) as e:
+        logger.debug("Transport state probe of %s failed: %r", ip, e)
+        return None
+    match = _TRANSPORT_STATE_RE.search(response)
+    return match.group(1).decode() if match else None
+
+
+def subscribe_transport_events(
+    speaker: SoCo,
+    on_event: Callable,
+    on_renew_failed: Optional[Callable] = None,
+):
+    """
+    Subscribe to AVTransport events so transport state changes are pushed instead of polled.
+    on_event(event) runs on SoCo's event listener thread, not the asyncio loop.
+    Returns the subscription, or None on error.
+    """
+    try:
+        subscription = speaker.avTransport.subscribe(auto_renew=True)
+        subscription.callback = on_event
+        subscription.auto_renew_fail = on_renew_failed
+        # The speaker's initial NOTIFY (current state) can arrive inside subscribe(), before the
+        # callback is set; SoCo then queues it on subscription.events, which nothing else reads.
+        # Replay it, since subscribed speakers are never probed and would otherwise go unnoticed.
+        while True:
+            try:
+                event = subscription.events.get_nowait()
+            except queue.Empty:
+                break
+            on_event(event)
+        logger.debug("Subscribed to transport events on %s", speaker.player_name)
+        return subscription
+    except Exception as e:
+        logger.debug("Could not subscribe to events on %s: %s", speaker.player_name, e)
+        return None
+
+
+def unsubscribe(subscription) -> None:
+    """Cancel an event subscription, ignoring errors from speakers that have gone away."""
+    try:
+        subscription.unsubscribe()
+    except Exception as e:
+        logger.debug("Error unsubscribing: %s", e)
 
 
 def adjust_volume(speaker: SoCo, delta: int = VOLUME_STEP) -> Optional[int]:
@@ -54,13 +325,14 @@ def adjust_volume(speaker: SoCo, delta: int = VOLUME_STEP) -> Optional[int]:
     Returns the new volume level, or None on error.
     """
     try:
-        current = speaker.group.volume
+        group = speaker.group  # Each .group access re-resolves the zone topology; do it once
+        current = group.volume
         new_volume = max(0, min(100, current + delta))
-        speaker.group.volume = new_volume
-        logger.debug(f"Volume: {current} -> {new_volume}")
+        group.volume = new_volume
+        logger.debug("Volume: %s -> %s", current, new_volume)
         return new_volume
-    except Exception as e:
-        logger.error(f"Error adjusting volume: {e}")
+    except _command_errors as e:
+        _log_command_error("adjusting volume", e)
         return None
 
 
@@ -81,8 +353,8 @@ def toggle_playback(speaker: SoCo) -> Optional[str]:
             speaker.play()
             logger.debug("Started playback")
             return "PLAYING"
-    except Exception as e:
-        logger.error(f"Error toggling playback: {e}")
+    except _command_errors as e:
+        _log_command_error("toggling playback", e)
         return None
 
 
@@ -95,8 +367,8 @@ def next_track(speaker: SoCo) -> bool:
         speaker.next()
         logger.debug("Skipped to next track")
         return True
-    except Exception as e:
-        logger.error(f"Error skipping to next track: {e}")
+    except _command_errors as e:
+        _log_command_error("skipping to next track", e)
         return False
 
 
@@ -111,21 +383,22 @@ def previous_track(speaker: SoCo, restart_threshold: int = 3) -> bool:
         track_info = speaker.get_current_track_info()
         position = track_info.get("position", "0:00:00")
 
-        # Parse position (format: H:MM:SS or HH:MM:SS)
-        parts = position.split(":")
-        seconds = int(parts[-1]) + int(parts[-2]) * 60
-        if len(parts) > 2:
-            seconds += int(parts[-3]) * 3600
+        # Parse position (format: H:MM:SS or HH:MM:SS); unparseable values (e.g. NOT_IMPLEMENTED for radio) count as 0
+        match = _POSITION_RE.match(position)
+        seconds = 0
+        if match:
+            hours, minutes, secs = match.groups()
+            seconds = int(secs) + int(minutes) * 60 + (int(hours) * 3600 if hours else 0)
 
         if seconds > restart_threshold:
             # Mid-track: restart current track
             speaker.seek("0:00:00")
-            logger.debug(f"Restarted track (was at {position})")
+            logger.debug("Restarted track (was at %s)", position)
         else:
             # Near start: go to previous track
             speaker.previous()
-            logger.debug(f"Previous track (was at {position})")
+            logger.debug("Previous track (was at %s)", position)
         return True
-    except Exception as e:
-        logger.error(f"Error in previous_track: {e}")
+    except _command_errors as e:
+        _log_command_error("going to previous track", e)
         return False
@@ -0,0 +1,119 @@
+"""Leading + trailing throttle for accumulated dial deltas, and the worker threads that apply them."""
+
+import asyncio
+import logging
+import queue
+import threading
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncThrottler:
+    """
+    Accumulates deltas and sends them through an async callback at most once per interval.
+    - Leading edge: the first delta after a quiet spell is sent immediately.
+    - Trailing edge: deltas arriving within the interval are summed and sent by one timer,
+      armed once per interval (never cancelled and re-armed per tick, so a burst costs one heap entry).
+    - At most one send is in flight; deltas arriving meanwhile go out after it completes.
+    The controller's sends only hand the delta to a DeltaWorker and return at once, so it is
+    the worker, applying one call at a time, that keeps read-modify-write updates
+    (volume, brightness) from racing or landing out of order.
+    """
+
+    def __init__(self, send: Callable[[int], Awaitable], interval: float):
+        self._send = send
+        self._interval = interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._delta = 0
+        self._last_send = float("-inf")
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None  # In-flight send (also keeps the task referenced)
+
+    def add(self, delta: int):
+        """Queue a delta; must be called from the event loop thread."""
+        self._delta += delta
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._schedule()
+
+    def cancel(self):
+        """Drop the pending delta and disarm the trailing timer; a send already in flight still completes."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._delta = 0
+
+    def _schedule(self):
+        """Send now if the interval has passed, otherwise arm the trailing timer (once)."""
+        if self._task is not None or self._timer is not None:
+            return  # The in-flight send or armed timer will pick up the new delta
+        wait = self._last_send + self._interval - self._loop.time()
+        if wait <= 0:
+            self._flush()
+        else:
+            self._timer = self._loop.call_later(wait, self._flush)
+
+    def _flush(self):
+        """Send the accumulated delta."""
+        self._timer = None
+        delta, self._delta = self._delta, 0
+        if delta:
+            self._last_send = self._loop.time()
+            self._task = self._loop.create_task(self._run(delta))
+
+    async def _run(self, delta: int):
+        """Await one send, then schedule anything that accumulated while it was in flight."""
+        try:
+            await self._send(delta)
+        except Exception as e:
+            logger.error(f"Throttled send failed: {e}")
+        finally:
+            self._task = None
+            if self._delta:
+                self._schedule()
+
+
+class DeltaWorker:
+    """
+    Long-lived thread applying deltas with a blocking function, one call at a time.
+    The event loop only enqueues; deltas that pile up while a call runs are summed into the next one.
+    """
+
+    def __init__(self, apply: Callable[[int], None], name: str):
+        self._apply = apply
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        """Start the worker thread."""
+        self._thread.start()
+
+    def put(self, delta: int):
+        """Queue a delta (never blocks)."""
+        self._queue.put_nowait(delta)
+
+    def stop(self):
+        """Ask the worker to exit once the call in progress (if any) finishes."""
+        self._queue.put_nowait(None)
+
+    def _run(self):
+        """Worker loop: take a delta, fold in anything already queued, apply it."""
+        while True:
+            delta = self._queue.get()
+            if delta is None:
+                return
+            while True:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    return
+                delta += more
+            if not delta:
+                continue
+            try:
+                self._apply(delta)
+            except Exception as e:
+                logger.error(f"{self._thread.name} failed to apply {delta:+d}: {e}")